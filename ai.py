@@ -0,0 +1,108 @@
+import random
+import time
+
+from bullets import SHOOT_COOLDOWN_DISTANCE
+from engine import TICK_RATE
+from navigation import NO_HOP, OPEN_DIRECTIONS, NavigationTables
+from recording import SHOOT_CODE
+
+# Id của bot phía server bắt đầu từ đây để không trùng id của client thật
+BOT_ID_BASE = 1 << 24
+# Bot chiếm tối đa tỉ lệ này số ô trống, để người chơi thật luôn còn chỗ vào và hồi sinh
+MAX_BOT_DENSITY = 0.25
+# Mỗi bot hành động khoảng chừng này lần mỗi giây (như một người chơi), bất kể tick rate
+BOT_ACTION_RATE = 4.0
+
+class BotController:
+    # Bot do server điều khiển, lấp chỗ trống để trận luôn có ít nhất `target` người chơi.
+    # Mỗi tick một bot chỉ tra bảng: quét tầm nhìn theo các hướng mở tìm đối thủ để quay lại bắn,
+    # nếu không thấy ai thì đi theo trường BFS về điểm mốc đang nhắm.
+    def __init__(self, engine, target, tick_rate=TICK_RATE):
+        self.engine = engine
+        self.target = target
+        # Ở tick rate cao mỗi bot chỉ hành động một trong `period` tick, lệch pha theo id để chia đều tải
+        self.period = max(1, round(tick_rate / BOT_ACTION_RATE))
+        started = time.perf_counter()
+        self.nav = NavigationTables(engine.maze, engine.open_masks)
+        print(f"Built bot navigation tables ({len(self.nav.waypoints)} waypoints) "
+              f"in {time.perf_counter() - started:.2f}s")
+        # RNG riêng: quyết định của bot được ghi lại như input nên replay không cần chạy lại bot
+        self.rng = random.Random(engine.seed + 1)
+        self.capacity = int(len(engine.grid.free_cells) * MAX_BOT_DENSITY)
+        # player_id -> [điểm mốc đang nhắm, tick bắn gần nhất]
+        self.bots = {}
+        self.next_id = BOT_ID_BASE
+
+    def __len__(self):
+        return len(self.bots)
+
+    def balance(self):
+        # Trả về (các bot vừa vào [(id, tên)], các bot vừa rời [id])
+        joined = []
+        left = []
+        humans = len(self.engine.players) - len(self.bots)
+        wanted = min(max(0, self.target - humans), self.capacity)
+        while len(self.bots) < wanted and self.nav.waypoints:
+            self.next_id += 1
+            name = f"AI{self.next_id - BOT_ID_BASE}"
+            self.engine.spawn_player(self.next_id, name)
+            self.bots[self.next_id] = [self.rng.randrange(len(self.nav.waypoints)), -SHOOT_COOLDOWN_DISTANCE]
+            joined.append((self.next_id, name))
+        while len(self.bots) > wanted:
+            player_id = next(reversed(self.bots))
+            del self.bots[player_id]
+            self.engine.remove_player(player_id)
+            left.append(player_id)
+        return joined, left
+
+    def step(self):
+        # Cho mọi bot hành động một lần; trả về [(id, mã hành động)] theo thứ tự đã áp dụng
+        engine = self.engine
+        players = engine.players
+        occupants = engine.grid.occupants
+        width = engine.grid.width
+        nav = self.nav
+        masks = nav.open_masks
+        sight = nav.sight
+        steps = nav.steps
+        tick = engine.ticks
+        period = self.period
+        actions = []
+        for player_id, state in self.bots.items():
+            if (tick + player_id) % period:
+                continue
+            player = players[player_id]
+            index = player.y * width + player.x
+            options = OPEN_DIRECTIONS[masks[index]]
+
+            aim = None
+            for code in options:
+                cell = index
+                for _ in range(sight[index * 4 + code]):
+                    cell += steps[code]
+                    if occupants[cell] is not None:
+                        # Người đầu tiên trên đường thẳng là người sẽ trúng đạn
+                        aim = code
+                        break
+                if aim is not None:
+                    break
+
+            if aim is not None:
+                if player.direction != aim:
+                    engine.move(player_id, aim)
+                    actions.append((player_id, aim))
+                elif tick - state[1] >= SHOOT_COOLDOWN_DISTANCE:
+                    engine.shoot(player_id)
+                    state[1] = tick
+                    actions.append((player_id, SHOOT_CODE))
+                continue
+
+            code = nav.toward[state[0]][index]
+            if code == NO_HOP:
+                state[0] = self.rng.randrange(len(nav.waypoints))
+                code = nav.toward[state[0]][index]
+                if code == NO_HOP:
+                    continue
+            engine.move(player_id, code)
+            actions.append((player_id, code))
+        return actions
@@ -0,0 +1,93 @@
+import asyncio
+import contextlib
+import time
+
+from outbound import MAX_WRITE_BUFFER, AsyncClientWriter
+from protocol import read_frame_async
+from scheduler import TickScheduler
+from server import GameServer
+
+class DatagramHandler(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, address):
+        self.server.handle_datagram(data, address)
+
+class AsyncGameServer(GameServer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Mọi thứ chạy trên một event loop nên không cần khóa thật
+        self.lock = contextlib.nullcontext()
+        self.next_client_id = 0
+        self.loop = None
+        self.udp_transport = None
+
+    async def handle_connection(self, reader, writer):
+        self.next_client_id += 1
+        client_id = self.next_client_id
+        print(f"Client connected from {writer.get_extra_info('peername')}")
+        try:
+            payload = await read_frame_async(reader)
+            writer.write(self.add_player(client_id, payload))
+            self.register_client(client_id, writer)
+
+            while True:
+                payload = await read_frame_async(reader)
+                self.handle_payload(client_id, payload)
+
+        except asyncio.IncompleteReadError:
+            pass
+        except Exception as e:
+            print(f"Error processing client {client_id}: {e}")
+        finally:
+            self.remove_client(client_id)
+            writer.close()
+
+    def redirect_clients(self, count, host, port):
+        # Có thể được gọi từ thread khác (điều khiển phòng), nên chuyển vào event loop
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(super().redirect_clients, count, host, port)
+
+    def send_datagram(self, buffers, address):
+        self.udp_transport.sendto(b''.join(buffers), address)
+
+    def open_writer(self, client_id, writer):
+        return AsyncClientWriter(client_id, writer, self.stats, MAX_WRITE_BUFFER, self.max_stale_frames)
+
+    async def game_loop(self):
+        scheduler = TickScheduler(self.tick_rate, self.stats)
+        while True:
+            steps, broadcast = scheduler.poll(time.perf_counter())
+            for step in range(steps):
+                self.run_tick(broadcast and step == steps - 1)
+            await asyncio.sleep(scheduler.delay(time.perf_counter()))
+
+    async def collect_stats(self):
+        return GameServer.stats_report(self)
+
+    def stats_report(self):
+        # Được gọi từ thread phục vụ stats: lấy số liệu trên event loop để không đọc dict đang bị sửa
+        return asyncio.run_coroutine_threadsafe(self.collect_stats(), self.loop).result(timeout=5)
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.open_listener()
+        self.start_stats()
+        server = await asyncio.start_server(self.handle_connection, sock=self.server_socket, backlog=1024)
+        if self.udp:
+            self.udp_transport, _ = await self.loop.create_datagram_endpoint(lambda: DatagramHandler(self),
+                                                                             sock=self.udp_socket)
+        async with server:
+            loop_task = asyncio.create_task(self.game_loop())
+            try:
+                await server.serve_forever()
+            finally:
+                loop_task.cancel()
+
+    def start(self):
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self.close_recorder()
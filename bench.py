@@ -0,0 +1,157 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+from bot import BotClient
+from engine import TICK_RATE
+from scheduler import tick_rate_arg
+from server import GameServer
+
+class TimedTicks:
+    # Giữ lại thời gian từng tick (update + broadcast) để tính percentile
+    def run_tick(self, broadcast=True):
+        started = time.perf_counter()
+        super().run_tick(broadcast)
+        self.tick_times.append(time.perf_counter() - started)
+
+def run_bench_server(port, use_async, numpy_bullets, udp, tick_rate, measuring, stopping, results):
+    sys.stdout = open(os.devnull, 'w')
+    if use_async:
+        from async_server import AsyncGameServer
+        base = AsyncGameServer
+    else:
+        base = GameServer
+    server_class = type(f"Timed{base.__name__}", (TimedTicks, base), {})
+    server = server_class(port=port, numpy_bullets=numpy_bullets, udp=udp, tick_rate=tick_rate)
+    server.tick_times = []
+
+    def report():
+        measuring.wait()
+        server.tick_times.clear()
+        cpu_started = time.process_time()
+        stopping.wait()
+        results.put({'ticks': list(server.tick_times), 'cpu': time.process_time() - cpu_started,
+                     'overruns': server.stats.overruns, 'skipped': server.stats.skipped_ticks})
+
+    threading.Thread(target=report, daemon=True).start()
+    server.start()
+
+def wait_for_port(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def drive_bots(bots, warmup, duration, measuring):
+    tasks = []
+    for bot in bots:
+        tasks.append(asyncio.create_task(bot.run()))
+        await asyncio.sleep(0.002)
+    await asyncio.sleep(warmup)
+
+    for bot in bots:
+        bot.reset_counters()
+    measuring.set()
+    started = time.perf_counter()
+    await asyncio.sleep(duration)
+    elapsed = time.perf_counter() - started
+
+    connected = sum(1 for bot in bots if bot.running)
+    for bot in bots:
+        bot.stop()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return elapsed, connected
+
+def run_bench(clients=100, duration=10.0, warmup=2.0, port=5599, use_async=False, numpy_bullets=False,
+              pattern='random', script='', rate=4.0, udp=False, tick_rate=None):
+    tick_rate = tick_rate or TICK_RATE
+    measuring = multiprocessing.Event()
+    stopping = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    server_process = multiprocessing.Process(target=run_bench_server, daemon=True,
+                                             args=(port, use_async, numpy_bullets, udp, tick_rate, measuring,
+                                                   stopping, results))
+    server_process.start()
+    try:
+        if not wait_for_port(port):
+            raise RuntimeError(f"Bench server did not start on port {port}")
+        bots = [BotClient(f"Bot{i + 1}", '127.0.0.1', port, pattern, script, rate, udp=udp) for i in range(clients)]
+        elapsed, connected = asyncio.run(drive_bots(bots, warmup, duration, measuring))
+        stopping.set()
+        server_stats = results.get(timeout=10)
+    finally:
+        server_process.terminate()
+        server_process.join()
+
+    ticks_ms = [t * 1000 for t in server_stats['ticks']]
+    latencies_ms = [l * 1000 for bot in bots for l in bot.latencies]
+    report = {
+        'clients': clients,
+        'connected': connected,
+        'duration': elapsed,
+        'ticks': len(ticks_ms),
+        'tick_rate': tick_rate,
+        'tick_overruns': server_stats['overruns'],
+        'ticks_skipped': server_stats['skipped'],
+        'tick_mean_ms': sum(ticks_ms) / len(ticks_ms) if ticks_ms else 0.0,
+        'tick_p50_ms': percentile(ticks_ms, 0.50),
+        'tick_p95_ms': percentile(ticks_ms, 0.95),
+        'tick_p99_ms': percentile(ticks_ms, 0.99),
+        'tick_max_ms': max(ticks_ms, default=0.0),
+        'latency_samples': len(latencies_ms),
+        'latency_p50_ms': percentile(latencies_ms, 0.50),
+        'latency_p95_ms': percentile(latencies_ms, 0.95),
+        'latency_p99_ms': percentile(latencies_ms, 0.99),
+        'bytes_in_per_client_s': sum(bot.bytes_in for bot in bots) / clients / elapsed,
+        'bytes_out_per_client_s': sum(bot.bytes_out for bot in bots) / clients / elapsed,
+        'server_cpu_percent': 100.0 * server_stats['cpu'] / elapsed
+    }
+    print_report(report, ('async' if use_async else 'threaded') + (' + udp' if udp else ''))
+    return report
+
+def print_report(report, core):
+    print(f"Bench: {report['connected']}/{report['clients']} bots connected, "
+          f"{report['duration']:.1f} s, {core} server core")
+    print(f"Tick duration (ms): mean {report['tick_mean_ms']:.2f}  p50 {report['tick_p50_ms']:.2f}  "
+          f"p95 {report['tick_p95_ms']:.2f}  p99 {report['tick_p99_ms']:.2f}  "
+          f"max {report['tick_max_ms']:.2f}  ({report['ticks']} ticks at {report['tick_rate']:g}/s, "
+          f"{report['tick_overruns']} overruns, {report['ticks_skipped']} skipped)")
+    print(f"Input -> broadcast latency (ms): p50 {report['latency_p50_ms']:.1f}  "
+          f"p95 {report['latency_p95_ms']:.1f}  p99 {report['latency_p99_ms']:.1f}  "
+          f"({report['latency_samples']} inputs)")
+    print(f"Traffic per client: {report['bytes_in_per_client_s']:.0f} B/s down, "
+          f"{report['bytes_out_per_client_s']:.0f} B/s up")
+    print(f"Server CPU: {report['server_cpu_percent']:.1f}% of one core")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Zace Game load benchmark")
+    parser.add_argument('--clients', type=int, default=100, help='Number of bots')
+    parser.add_argument('--duration', type=float, default=10.0, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Seconds before measuring starts')
+    parser.add_argument('--port', type=int, default=5599)
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Benchmark the asyncio core')
+    parser.add_argument('--numpy-bullets', action='store_true', help='Use the NumPy bullet store')
+    parser.add_argument('--pattern', choices=['random', 'script'], default='random')
+    parser.add_argument('--script', default='')
+    parser.add_argument('--rate', type=float, default=4.0, help='Inputs per second per bot')
+    parser.add_argument('--udp', action='store_true', help='Bots receive updates and send inputs over UDP')
+    parser.add_argument('--tick-rate', type=tick_rate_arg, default=TICK_RATE, help='Server simulation ticks per second')
+    args = parser.parse_args()
+
+    run_bench(args.clients, args.duration, args.warmup, args.port, args.use_async, args.numpy_bullets,
+              args.pattern, args.script, args.rate, args.udp, args.tick_rate)
@@ -0,0 +1,230 @@
+import argparse
+import asyncio
+import random
+import time
+
+from collections import deque
+
+from protocol import (DIRECTIONS, HEADER, REDUNDANT_INPUTS, ProtocolError, decode_message, encode_message, frame,
+                      read_frame_async)
+from snapshot import SnapshotHistory
+
+SCRIPT_ACTIONS = {'u': 'up', 'd': 'down', 'l': 'left', 'r': 'right'}
+
+def bot_action(pattern, script, rng, step):
+    # Dùng chung cho bot qua mạng và bot trong simulate.py
+    if pattern == 'script':
+        action = script[step % len(script)]
+        if action == 's':
+            return {'type': 'shoot'}
+        return {'type': 'move', 'direction': SCRIPT_ACTIONS[action]}
+    if rng.random() < 0.25:
+        return {'type': 'shoot'}
+    return {'type': 'move', 'direction': rng.choice(DIRECTIONS)}
+
+class BotDatagrams(asyncio.DatagramProtocol):
+    def __init__(self, bot):
+        self.bot = bot
+
+    def datagram_received(self, data, address):
+        self.bot.bytes_in += len(data)
+        try:
+            message = decode_message(data)
+        except ProtocolError:
+            return
+        if message['type'] == 'update':
+            self.bot.handle_message(message)
+
+    def error_received(self, exc):
+        pass
+
+class BotClient:
+    def __init__(self, name, host='127.0.0.1', port=5555, pattern='random', script='', rate=4.0,
+                 debug=False, rng=None, udp=False):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.pattern = pattern
+        self.script = script or 'uurrddlls'
+        self.rate = rate
+        self.debug = debug
+        self.rng = rng or random.Random()
+        self.udp = udp
+
+        self.writer = None
+        self.udp_transport = None
+        self.udp_token = None
+        self.recent_inputs = deque(maxlen=REDUNDANT_INPUTS)
+        self.input_ack = 0
+        self.player_id = None
+        self.history = SnapshotHistory()
+        self.players = {}
+        self.input_seq = 0
+        self.sent_at = {}
+        self.running = True
+
+        self.latencies = []
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.updates = 0
+
+    def reset_counters(self):
+        self.latencies = []
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.updates = 0
+
+    def send(self, message):
+        if self.udp_transport is not None:
+            self.send_inputs(message)
+            return
+        data = frame(encode_message(message, self.debug))
+        self.bytes_out += len(data)
+        self.writer.write(data)
+
+    def send_inputs(self, message=None):
+        # Như GameClient: mỗi gói mang ack mới nhất và các input gần nhất chưa được xác nhận
+        if message is not None and message['type'] in ('move', 'shoot'):
+            self.recent_inputs.append(message)
+        packet = {
+            'type': 'inputs',
+            'token': self.udp_token,
+            'ack': self.history.last_seq,
+            'inputs': [item for item in self.recent_inputs if item['seq'] > self.input_ack]
+        }
+        data = encode_message(packet, self.debug)
+        self.bytes_out += len(data)
+        self.udp_transport.sendto(data)
+
+    async def open_udp(self, token, port):
+        self.close_udp()
+        loop = asyncio.get_running_loop()
+        self.udp_transport, _ = await loop.create_datagram_endpoint(lambda: BotDatagrams(self),
+                                                                    remote_addr=(self.host, port))
+        self.udp_token = token
+        self.recent_inputs.clear()
+        self.send_inputs()
+
+    def close_udp(self):
+        if self.udp_transport is not None:
+            self.udp_transport.close()
+            self.udp_transport = None
+
+    async def connect(self):
+        reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.send({'type': 'join', 'name': self.name})
+        return reader
+
+    async def read_frame(self, reader):
+        payload = await read_frame_async(reader)
+        self.bytes_in += HEADER.size + len(payload)
+        return payload
+
+    def handle_message(self, message):
+        if message['type'] == 'init':
+            self.player_id = message['id']
+            self.history.reset(message['history'])
+        elif message['type'] == 'update':
+            state = self.history.apply(message)
+            if state is None:
+                return
+            self.players = state[0]
+            self.updates += 1
+            self.input_ack = max(self.input_ack, message['input_ack'])
+            self.send({'type': 'ack', 'seq': message['seq']})
+
+            now = time.perf_counter()
+            for seq in [s for s in self.sent_at if s <= message['input_ack']]:
+                self.latencies.append(now - self.sent_at.pop(seq))
+
+    def next_action(self, step):
+        return bot_action(self.pattern, self.script, self.rng, step)
+
+    async def input_loop(self):
+        step = 0
+        while self.running:
+            await asyncio.sleep(self.rng.uniform(0.5, 1.5) / self.rate)
+            if self.player_id is None or self.writer is None or self.writer.is_closing():
+                continue
+            message = self.next_action(step)
+            step += 1
+            self.input_seq += 1
+            message['seq'] = self.input_seq
+            self.sent_at[self.input_seq] = time.perf_counter()
+            self.send(message)
+
+    async def run(self):
+        reader = await self.connect()
+        input_task = asyncio.create_task(self.input_loop())
+        try:
+            while self.running:
+                message = decode_message(await self.read_frame(reader))
+                if message['type'] == 'redirect':
+                    self.writer.close()
+                    self.close_udp()
+                    self.host, self.port = message['host'], message['port']
+                    self.player_id = None
+                    self.history.reset()
+                    self.sent_at.clear()
+                    self.input_ack = 0
+                    reader = await self.connect()
+                    continue
+                if message['type'] == 'udp':
+                    if self.udp:
+                        await self.open_udp(message['token'], message['port'])
+                    continue
+                self.handle_message(message)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.running = False
+            input_task.cancel()
+            self.close_udp()
+            if self.writer is not None:
+                self.writer.close()
+
+    def stop(self):
+        self.running = False
+        self.close_udp()
+        if self.writer is not None:
+            self.writer.close()
+
+async def run_swarm(count, host='127.0.0.1', port=5555, pattern='random', script='', rate=4.0,
+                    debug=False, duration=None, seed=None, udp=False):
+    rng = random.Random(seed)
+    bots = [BotClient(f"Bot{i + 1}", host, port, pattern, script, rate, debug, random.Random(rng.random()), udp)
+            for i in range(count)]
+    tasks = []
+    for bot in bots:
+        tasks.append(asyncio.create_task(bot.run()))
+        # Kết nối rải rác một chút để không dồn hết vào backlog của server
+        await asyncio.sleep(0.002)
+    if duration is not None:
+        await asyncio.sleep(duration)
+        for bot in bots:
+            bot.stop()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return bots
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Zace Game headless bots")
+    parser.add_argument('--clients', type=int, default=10, help='Number of bots to connect')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5555)
+    parser.add_argument('--pattern', choices=['random', 'script'], default='random',
+                        help='Random moves/shots or a repeating script')
+    parser.add_argument('--script', default='',
+                        help="Script for --pattern script: u/d/l/r moves, s shoots (e.g. 'uurrs')")
+    parser.add_argument('--rate', type=float, default=4.0, help='Inputs per second per bot')
+    parser.add_argument('--duration', type=float, default=None, help='Seconds to run (default: forever)')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', action='store_true',
+                        help='Send JSON frames instead of the binary encoding (debugging)')
+    parser.add_argument('--udp', action='store_true', help='Use UDP for updates and inputs if the server offers it')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_swarm(args.clients, args.host, args.port, args.pattern, args.script, args.rate,
+                              args.json, args.duration, args.seed, args.udp))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,148 @@
+import heapq
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from maze import maze_cells
+from protocol import DIRECTION_DX, DIRECTION_DY
+from records import Bullet
+
+# Không được bắn viên mới khi viên trước của mình chưa bay đủ quãng này
+SHOOT_COOLDOWN_DISTANCE = 4
+
+class BulletStore:
+    def __init__(self):
+        self.bullets = []
+
+    def __len__(self):
+        return len(self.bullets)
+
+    def spawn(self, bullet_id, x, y, direction, owner):
+        self.bullets.append(Bullet(bullet_id, x, y, direction, owner))
+
+    def recently_fired(self, owner):
+        return any(b.owner == owner and b.distance < SHOOT_COOLDOWN_DISTANCE for b in self.bullets)
+
+    def step(self, grid, on_hit):
+        new_bullets = []
+        for bullet in self.bullets:
+            bullet.x += DIRECTION_DX[bullet.direction]
+            bullet.y += DIRECTION_DY[bullet.direction]
+            bullet.distance += 1
+
+            if grid.is_wall(bullet.x, bullet.y):
+                continue
+
+            victim = grid.occupant_at(bullet.x, bullet.y)
+            if victim is not None and victim != bullet.owner:
+                on_hit(bullet.owner, victim)
+            else:
+                new_bullets.append(bullet)
+
+        self.bullets = new_bullets
+
+    def to_rows(self):
+        return [bullet.row() for bullet in self.bullets]
+
+class ArrayBulletStore:
+    def __init__(self, maze, capacity=256):
+        if np is None:
+            raise RuntimeError("ArrayBulletStore requires NumPy")
+        self.walls = np.frombuffer(maze_cells(maze), dtype=np.uint8).reshape(len(maze), -1) == 1
+        self.height, self.width = self.walls.shape
+        self.count = 0
+
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.x = np.zeros(capacity, dtype=np.int32)
+        self.y = np.zeros(capacity, dtype=np.int32)
+        self.dx = np.zeros(capacity, dtype=np.int32)
+        self.dy = np.zeros(capacity, dtype=np.int32)
+        self.direction = np.zeros(capacity, dtype=np.int8)
+        self.owner = np.zeros(capacity, dtype=np.int64)
+        self.distance = np.zeros(capacity, dtype=np.int32)
+
+    def __len__(self):
+        return self.count
+
+    def _columns(self):
+        return ('ids', 'x', 'y', 'dx', 'dy', 'direction', 'owner', 'distance')
+
+    def _grow(self):
+        capacity = len(self.ids) * 2
+        for name in self._columns():
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.count] = column[:self.count]
+            setattr(self, name, grown)
+
+    def spawn(self, bullet_id, x, y, direction, owner):
+        if self.count == len(self.ids):
+            self._grow()
+        i = self.count
+        self.ids[i] = bullet_id
+        self.x[i] = x
+        self.y[i] = y
+        self.dx[i] = DIRECTION_DX[direction]
+        self.dy[i] = DIRECTION_DY[direction]
+        self.direction[i] = direction
+        self.owner[i] = owner
+        self.distance[i] = 0
+        self.count += 1
+
+    def recently_fired(self, owner):
+        n = self.count
+        return bool(np.any((self.owner[:n] == owner) & (self.distance[:n] < SHOOT_COOLDOWN_DISTANCE)))
+
+    def step(self, grid, on_hit):
+        n = self.count
+        if n == 0:
+            return
+
+        x = self.x[:n]
+        y = self.y[:n]
+        x += self.dx[:n]
+        y += self.dy[:n]
+        self.distance[:n] += 1
+
+        alive = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        alive[alive] = ~self.walls[y[alive], x[alive]]
+        cells = np.where(alive, y * self.width + x, -1)
+
+        if grid.occupied_mask is not None:
+            candidates = np.flatnonzero(alive & grid.occupied_mask[np.maximum(cells, 0)])
+        else:
+            candidates = np.flatnonzero(alive)
+
+        # Xử lý trúng đạn theo đúng thứ tự viên đạn như vòng lặp tuần tự:
+        # nạn nhân hồi sinh có thể đứng ngay trên một viên đạn phía sau.
+        pending = candidates.tolist()
+        heapq.heapify(pending)
+        seen = set(pending)
+        while pending:
+            i = heapq.heappop(pending)
+            owner = int(self.owner[i])
+            victim = grid.occupant_at(int(x[i]), int(y[i]))
+            if victim is None or victim == owner:
+                continue
+            alive[i] = False
+            respawn = on_hit(owner, victim)
+            if respawn is None:
+                continue
+            later = np.flatnonzero(alive[i + 1:] & (cells[i + 1:] == grid.index(*respawn))) + i + 1
+            for j in later.tolist():
+                if j not in seen:
+                    seen.add(j)
+                    heapq.heappush(pending, j)
+
+        keep = np.flatnonzero(alive)
+        for name in self._columns():
+            column = getattr(self, name)
+            column[:len(keep)] = column[:n][keep]
+        self.count = len(keep)
+
+    def to_rows(self):
+        n = self.count
+        return list(zip(self.ids[:n].tolist(), self.x[:n].tolist(), self.y[:n].tolist(),
+                        self.direction[:n].tolist(), self.owner[:n].tolist(), self.distance[:n].tolist()))
@@ -1,15 +1,30 @@
 import pygame
 import socket
-import json
 import threading
 import sys
+import time
+import argparse
+
+from collections import deque
+
+from protocol import (REDUNDANT_INPUTS, ProtocolError, build_maze, decode_message, encode_message, read_frame,
+                      send_message)
+from snapshot import ClientState, MovePredictor, SnapshotBuffer, SnapshotHistory
 
 pygame.init()
 
 CELL_SIZE = 30
+# Cửa sổ nhập tên; khi nhận init cửa sổ đổi theo kích thước mê cung, tối đa MAX_VIEW_*
 WINDOW_WIDTH = 32 * CELL_SIZE
 WINDOW_HEIGHT = 16 * CELL_SIZE + 100
+MAX_VIEW_WIDTH = 1280
+MAX_VIEW_HEIGHT = 720
+SCOREBOARD_HEIGHT = 100
+# Nền mê cung được vẽ sẵn rộng hơn khung nhìn chừng này ô mỗi phía, để camera cuộn mà không phải vẽ lại
+MAZE_MARGIN = 8
+MINIMAP_WIDTH = 160
 FPS = 60
+TEXT_CACHE_SIZE = 512
 
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
@@ -19,32 +34,61 @@ BLUE = (0, 0, 255)
 YELLOW = (255, 255, 0)
 GRAY = (128, 128, 128)
 
+DIRECTION_KEYS = {pygame.K_UP: 'up', pygame.K_DOWN: 'down', pygame.K_LEFT: 'left', pygame.K_RIGHT: 'right'}
+# Id trong init của người xem (qua relay.py): không có nhân vật, camera đi theo một người chơi khác
+SPECTATOR_ID = 0
+
 class GameClient:
-    def __init__(self, host='127.0.0.1', port=5555):
+    def __init__(self, host='127.0.0.1', port=5555, debug=False, udp=False):
         self.host = host
         self.port = port
+        self.debug = debug
         self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Chế độ UDP: update và input đi qua socket này sau khi server gửi token qua TCP
+        self.udp = udp
+        self.udp_socket = None
+        self.udp_token = None
+        self.recent_inputs = deque(maxlen=REDUNDANT_INPUTS)
+        self.history = SnapshotHistory()
+        self.input_seq = 0
+        # Luồng mạng dựng ClientState mới rồi gán vào đây; luồng vẽ chỉ đọc, không ai phải chờ ai
+        self.state = ClientState()
+        
+        # Từ đây trở xuống chỉ luồng vẽ dùng, lấy từ ClientState trong sync()
+        self.generation = 0
         self.player_id = None
         self.maze = []
-        self.players = {}
-        self.bullets = []
-        self.status_messages = []
+        self.minimap = None
+        # Vẽ người chơi khác/đạn nội suy giữa các snapshot, nhân vật của mình theo dự đoán
+        self.predictor = MovePredictor()
+        self.predicted_version = None
+        self.maze_surface = None
+        self.maze_origin = (0, 0)
+        self.camera = (0, 0)
+        # Người xem: id người chơi camera đang theo (phím trái/phải để đổi), None là theo người dẫn đầu
+        self.followed = None
+        self.minimap_surface = None
+        self.view_width = WINDOW_WIDTH
+        self.view_height = WINDOW_HEIGHT - SCOREBOARD_HEIGHT
+        self.previous_rects = []
+        self.scoreboard_version = None
+        self.text_cache = {}
         
         pygame.init()
         self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
         pygame.display.set_caption("Zace Game")
         self.clock = pygame.time.Clock()
         self.font = pygame.font.SysFont('Arial', 20)
+        self.name_font = pygame.font.SysFont('Arial', 14)
         
-        self.lock = threading.Lock()
+        # Chỉ giữa thread nhận TCP và thread nhận UDP; luồng vẽ không bao giờ lấy khóa này
+        self.receive_lock = threading.Lock()
+        self.send_lock = threading.Lock()
         
         self.player_name = self.get_player_name()
         
         try:
-            self.client_socket.connect((self.host, self.port))
-            print(f"Connected to the server at {self.host}:{self.port}")
-            # Chỉ gửi tên người chơi
-            self.client_socket.send(self.player_name.encode())
+            self.connect()
         except Exception as e:
             print(f"Unable to connect to the server: {e}")
             sys.exit()
@@ -52,58 +96,283 @@ class GameClient:
         self.running = True
         threading.Thread(target=self.receive_data, daemon=True).start()
 
+    def connect(self):
+        self.client_socket.connect((self.host, self.port))
+        print(f"Connected to the server at {self.host}:{self.port}")
+        # Chỉ gửi tên người chơi
+        send_message(self.client_socket, {'type': 'join', 'name': self.player_name, 'full_maze': True}, self.debug)
+
+    def follow_redirect(self, host, port):
+        # Lobby hoặc phòng hiện tại chuyển ta sang phòng khác: kết nối lại và chờ init mới
+        print(f"Moving to {host}:{port}")
+        with self.send_lock:
+            self.client_socket.close()
+            self.close_udp()
+            self.host, self.port = host, port
+            self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.connect()
+        with self.receive_lock:
+            self.history.reset()
+            self.state = self.state.replace(buffer=SnapshotBuffer(), input_ack=0)
+        return self.client_socket.makefile('rb')
+
     def receive_data(self):
         try:
+            stream = self.client_socket.makefile('rb')
             while self.running:
-                data = self.client_socket.recv(4096).decode()
-                if not data:
+                payload = read_frame(stream)
+                if payload is None:
                     break
                 try:
-                    message = json.loads(data)
-                    self.process_server_message(message)
-                except json.JSONDecodeError:
-                    print("Invalid JSON received")
+                    message = decode_message(payload)
+                except ProtocolError as e:
+                    print(f"Invalid message received: {e}")
+                    continue
+                if message['type'] == 'redirect':
+                    stream = self.follow_redirect(message['host'], message['port'])
                     continue
+                if message['type'] == 'udp':
+                    if self.udp:
+                        self.open_udp(message['token'], message['port'])
+                    continue
+                self.process_server_message(message)
         except Exception as e:
             print(f"Error receiving data: {e}")
         finally:
             self.running = False
             print("Disconnected from server")
     
+    def open_udp(self, token, port):
+        with self.send_lock:
+            self.close_udp()
+            self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.udp_socket.connect((self.host, port))
+            self.udp_token = token
+            self.recent_inputs.clear()
+            # Gói đầu tiên (chưa có input) để server biết địa chỉ UDP của ta
+            self.send_inputs()
+        threading.Thread(target=self.receive_datagrams, args=(self.udp_socket,), daemon=True).start()
+        print(f"Receiving updates over UDP from {self.host}:{port}")
+
+    def close_udp(self):
+        if self.udp_socket is not None:
+            self.udp_socket.close()
+            self.udp_socket = None
+
+    def receive_datagrams(self, udp_socket):
+        while self.running:
+            try:
+                data = udp_socket.recv(65535)
+            except ConnectionRefusedError:
+                continue
+            except OSError:
+                return
+            try:
+                message = decode_message(data)
+            except ProtocolError as e:
+                print(f"Invalid datagram received: {e}")
+                continue
+            # Update cũ hơn update đã áp dụng (đến trễ, sai thứ tự) bị SnapshotHistory bỏ qua
+            if message['type'] in ('update', 'minimap'):
+                self.process_server_message(message)
+
+    def send_inputs(self):
+        # Mỗi gói mang ack mới nhất và các input gần nhất server chưa xác nhận, nên mất vài gói
+        # liên tiếp cũng không mất input
+        packet = {
+            'type': 'inputs',
+            'token': self.udp_token,
+            'ack': self.history.last_seq,
+            'inputs': [item for item in self.recent_inputs if item['seq'] > self.state.input_ack]
+        }
+        self.udp_socket.send(encode_message(packet, self.debug))
+
     def process_server_message(self, message):
-        with self.lock:
+        acked_seq = None
+        with self.receive_lock:
+            state = self.state
             if message['type'] == 'init':
-                self.player_id = message['id']
-                self.maze = message['maze']
-                self.players = message['players']
-                self.bullets = message['bullets']
-                print(f"Initialized as player {self.player_id}")
+                players = {int(player_id): player for player_id, player in message['players'].items()}
+                bullets = {bullet['id']: bullet for bullet in message['bullets']}
+                # Giữ đủ baseline như server giữ (số này đổi theo tick rate của server)
+                self.history.reset(message['history'])
+                self.state = ClientState(state.generation + 1, message['id'], build_maze(message), players,
+                                         version=state.version + 1,
+                                         buffer=SnapshotBuffer().push(time.monotonic(), players, bullets))
+                print(f"Initialized as player {message['id']}")
+            
+            elif message['type'] == 'minimap':
+                self.state = state.replace(minimap=message)
             
             elif message['type'] == 'update':
-                self.players = message['players']
-                self.bullets = message['bullets']
-                self.status_messages = message.get('status', [])
+                if self.apply_update(message):
+                    acked_seq = message['seq']
+        if acked_seq is not None:
+            self.send_action('ack', seq=acked_seq)
+
+    def apply_update(self, message):
+        applied = self.history.apply(message)
+        if applied is None:
+            return False
+        players, bullets, events = applied
+        state = self.state
+        self.state = state.replace(players=players, events=events, input_ack=message['input_ack'],
+                                   version=state.version + 1,
+                                   buffer=state.buffer.push(time.monotonic(), players, bullets))
+        return True
 
     def send_action(self, action_type, **kwargs):
         message = {'type': action_type, **kwargs}
         try:
-            self.client_socket.send(json.dumps(message).encode())
+            with self.send_lock:
+                if action_type in ('move', 'shoot'):
+                    self.input_seq += 1
+                    message['seq'] = self.input_seq
+                if self.udp_socket is None:
+                    send_message(self.client_socket, message, self.debug)
+                else:
+                    if action_type in ('move', 'shoot'):
+                        self.recent_inputs.append(message)
+                    self.send_inputs()
         except Exception as e:
             print(f"Error sending action: {e}")
+            return None
+        return message.get('seq')
+
+    def move(self, direction):
+        seq = self.send_action('move', direction=direction)
+        if seq is None:
+            return
+        if self.maze and self.player_id is not None:
+            self.predictor.record(seq, direction, self.maze, self.state.players, self.player_id)
+    
+    def sync(self, state):
+        # Luồng vẽ: đưa ảnh chụp mới nhất vào những phần chỉ luồng vẽ dùng (nền mê cung, minimap, dự đoán)
+        if state.generation != self.generation:
+            self.generation = state.generation
+            self.player_id = state.player_id
+            self.maze = state.maze
+            self.maze_surface = None
+            self.predictor.reset()
+        if state.minimap is not self.minimap:
+            self.minimap = state.minimap
+            self.minimap_surface = None
+        if state.version != self.predicted_version:
+            self.predicted_version = state.version
+            self.predictor.reconcile(state.input_ack, self.maze, state.players, self.player_id)
 
-    def draw_maze(self):
-        for y in range(len(self.maze)):
-            for x in range(len(self.maze[0])):
-                rect = pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+    def resize_view(self):
+        self.view_width = min(len(self.maze[0]) * CELL_SIZE, MAX_VIEW_WIDTH)
+        self.view_height = min(len(self.maze) * CELL_SIZE, MAX_VIEW_HEIGHT)
+        size = (self.view_width, self.view_height + SCOREBOARD_HEIGHT)
+        if self.screen.get_size() != size:
+            self.screen = pygame.display.set_mode(size)
+
+    def focus_id(self, players):
+        if self.player_id != SPECTATOR_ID:
+            return self.player_id
+        if self.followed in players or not players:
+            return self.followed
+        return max(players, key=lambda player_id: players[player_id]['score'])
+
+    def follow_next(self, step):
+        player_ids = sorted(self.state.players)
+        if not player_ids:
+            return
+        current = self.focus_id(self.state.players)
+        index = player_ids.index(current) + step if current in player_ids else 0
+        self.followed = player_ids[index % len(player_ids)]
+
+    def camera_for(self, player):
+        # Góc trên trái khung nhìn (pixel), giữ người chơi ở giữa nhưng không vượt ra ngoài bản đồ
+        if player is None:
+            return self.camera
+        max_x = len(self.maze[0]) * CELL_SIZE - self.view_width
+        max_y = len(self.maze) * CELL_SIZE - self.view_height
+        x = round(player['x'] * CELL_SIZE) + CELL_SIZE // 2 - self.view_width // 2
+        y = round(player['y'] * CELL_SIZE) + CELL_SIZE // 2 - self.view_height // 2
+        return min(max(0, x), max_x), min(max(0, y), max_y)
+
+    def background_covers(self, camera):
+        left = camera[0] - self.maze_origin[0]
+        top = camera[1] - self.maze_origin[1]
+        width, height = self.maze_surface.get_size()
+        return left >= 0 and top >= 0 and left + self.view_width <= width and top + self.view_height <= height
+
+    def build_maze_surface(self, camera):
+        # Mê cung không đổi sau init nên vẽ một lần ra surface riêng: phần quanh khung nhìn cộng MAZE_MARGIN ô
+        first_x = max(0, camera[0] // CELL_SIZE - MAZE_MARGIN)
+        first_y = max(0, camera[1] // CELL_SIZE - MAZE_MARGIN)
+        last_x = min(len(self.maze[0]), (camera[0] + self.view_width) // CELL_SIZE + 1 + MAZE_MARGIN)
+        last_y = min(len(self.maze), (camera[1] + self.view_height) // CELL_SIZE + 1 + MAZE_MARGIN)
+        self.maze_origin = (first_x * CELL_SIZE, first_y * CELL_SIZE)
+        surface = pygame.Surface(((last_x - first_x) * CELL_SIZE, (last_y - first_y) * CELL_SIZE)).convert()
+        for y in range(first_y, last_y):
+            for x in range(first_x, last_x):
+                rect = pygame.Rect((x - first_x) * CELL_SIZE, (y - first_y) * CELL_SIZE, CELL_SIZE, CELL_SIZE)
                 if self.maze[y][x] == 1:
-                    pygame.draw.rect(self.screen, GRAY, rect)
-                    pygame.draw.line(self.screen, (160, 160, 160), rect.topleft, rect.topright, 2)
-                    pygame.draw.line(self.screen, (160, 160, 160), rect.topleft, rect.bottomleft, 2)
-                    pygame.draw.line(self.screen, (100, 100, 100), rect.bottomleft, rect.bottomright, 2)
-                    pygame.draw.line(self.screen, (100, 100, 100), rect.topright, rect.bottomright, 2)
+                    pygame.draw.rect(surface, GRAY, rect)
+                    pygame.draw.line(surface, (160, 160, 160), rect.topleft, rect.topright, 2)
+                    pygame.draw.line(surface, (160, 160, 160), rect.topleft, rect.bottomleft, 2)
+                    pygame.draw.line(surface, (100, 100, 100), rect.bottomleft, rect.bottomright, 2)
+                    pygame.draw.line(surface, (100, 100, 100), rect.topright, rect.bottomright, 2)
                 else:
-                    pygame.draw.rect(self.screen, (20, 20, 30), rect)
-                    pygame.draw.rect(self.screen, (30, 30, 40), rect, 1)
+                    pygame.draw.rect(surface, (20, 20, 30), rect)
+                    pygame.draw.rect(surface, (30, 30, 40), rect, 1)
+        return surface
+
+    def render_text(self, font, text, color):
+        key = (id(font), text, color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            if len(self.text_cache) >= TEXT_CACHE_SIZE:
+                self.text_cache.clear()
+            surface = self.text_cache[key] = font.render(text, True, color)
+        return surface
+
+    def render_frame(self, state):
+        # Trả về danh sách vùng màn hình cần cập nhật
+        players, bullets = state.buffer.sample(time.monotonic())
+        predicted = self.predictor.state
+        if predicted is not None and self.player_id in state.players:
+            players[self.player_id] = dict(state.players[self.player_id], **predicted)
+        
+        full_redraw = self.maze_surface is None
+        if full_redraw:
+            self.resize_view()
+            self.screen.fill(BLACK)
+            self.scoreboard_version = None
+        camera = self.camera_for(players.get(self.focus_id(players)))
+        if full_redraw or not self.background_covers(camera):
+            self.maze_surface = self.build_maze_surface(camera)
+        scrolled = full_redraw or camera != self.camera
+        self.camera = camera
+        
+        view_rect = pygame.Rect(0, 0, self.view_width, self.view_height)
+        offset = (camera[0] - self.maze_origin[0], camera[1] - self.maze_origin[1])
+        if scrolled:
+            self.screen.blit(self.maze_surface, (0, 0), view_rect.move(offset))
+            self.previous_rects = []
+        else:
+            # Xóa lớp chuyển động của frame trước bằng cách chép lại nền mê cung
+            for rect in self.previous_rects:
+                self.screen.blit(self.maze_surface, rect, rect.move(offset))
+        # Người chơi nằm vắt qua mép khung nhìn không được vẽ đè lên bảng điểm
+        self.screen.set_clip(view_rect)
+        rects = [rect.clip(view_rect) for rect in self.draw_players(players) + self.draw_bullets(bullets)]
+        self.screen.set_clip(None)
+        dirty = self.previous_rects + rects
+        self.previous_rects = rects
+        
+        minimap_rect = self.draw_minimap(players.get(self.player_id))
+        if minimap_rect is not None:
+            dirty.append(minimap_rect)
+        scoreboard_rect = self.draw_scoreboard(state)
+        if scoreboard_rect is not None:
+            dirty.append(scoreboard_rect)
+        if full_redraw:
+            return [self.screen.get_rect()]
+        return [view_rect] + dirty if scrolled else dirty
 
     def get_player_name(self):
         player_name = ""
@@ -125,26 +394,31 @@ class GameClient:
                             player_name += event.unicode
             
             self.screen.fill(BLACK)
-            title_text = self.font.render("Enter your name:", True, WHITE)
+            title_text = self.render_text(self.font, "Enter your name:", WHITE)
             self.screen.blit(title_text, (WINDOW_WIDTH // 2 - title_text.get_width() // 2, WINDOW_HEIGHT // 2 - 60))
             pygame.draw.rect(self.screen, WHITE, input_box, 2)
-            input_surface = self.font.render(player_name, True, WHITE)
+            input_surface = self.render_text(self.font, player_name, WHITE)
             self.screen.blit(input_surface, (input_box.x + 5, input_box.y + 5))
-            guide_text = self.font.render("Press <Enter> to start", True, GREEN)
+            guide_text = self.render_text(self.font, "Press <Enter> to start", GREEN)
             self.screen.blit(guide_text, (WINDOW_WIDTH // 2 - guide_text.get_width() // 2, WINDOW_HEIGHT // 2 + 60))
             pygame.display.flip()
             self.clock.tick(30)
         
         return player_name
 
-    def draw_players(self):
-        for player_id, player in self.players.items():
+    def draw_players(self, players):
+        rects = []
+        for player_id, player in players.items():
             color = GREEN if str(player_id) == str(self.player_id) else RED
-            rect = pygame.Rect(player['x'] * CELL_SIZE, player['y'] * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+            # Toạ độ có thể là số thực khi đang nội suy
+            left = round(player['x'] * CELL_SIZE) - self.camera[0]
+            top = round(player['y'] * CELL_SIZE) - self.camera[1]
+            rect = pygame.Rect(left, top, CELL_SIZE, CELL_SIZE)
             pygame.draw.rect(self.screen, color, rect)
+            rects.append(rect)
     
-            center_x = player['x'] * CELL_SIZE + CELL_SIZE // 2
-            center_y = player['y'] * CELL_SIZE + CELL_SIZE // 2
+            center_x = left + CELL_SIZE // 2
+            center_y = top + CELL_SIZE // 2
             indicator_length = CELL_SIZE // 2 - 2
             
             if player['direction'] == 'up':
@@ -161,50 +435,92 @@ class GameClient:
                                 (center_x + indicator_length, center_y), 3)
             
             name = player.get('name', f"Player {player_id}")
-            name_surface = pygame.font.SysFont('Arial', 14).render(name, True, WHITE)
-            self.screen.blit(name_surface, 
+            name_surface = self.render_text(self.name_font, name, WHITE)
+            rects.append(self.screen.blit(name_surface, 
                         (center_x - name_surface.get_width() // 2, 
-                            player['y'] * CELL_SIZE - 18))
+                            top - 18)))
+        return rects
     
-    def draw_bullets(self):
-        for bullet in self.bullets:
-            center_x = bullet['x'] * CELL_SIZE + CELL_SIZE // 2
-            center_y = bullet['y'] * CELL_SIZE + CELL_SIZE // 2
-            pygame.draw.circle(self.screen, YELLOW, (center_x, center_y), CELL_SIZE // 4)
+    def draw_bullets(self, bullets):
+        rects = []
+        for bullet in bullets:
+            center_x = round(bullet['x'] * CELL_SIZE) - self.camera[0] + CELL_SIZE // 2
+            center_y = round(bullet['y'] * CELL_SIZE) - self.camera[1] + CELL_SIZE // 2
+            rects.append(pygame.draw.circle(self.screen, YELLOW, (center_x, center_y), CELL_SIZE // 4))
+        return rects
     
-    def draw_scoreboard(self):
-        scoreboard_y = 16 * CELL_SIZE
-        pygame.draw.rect(self.screen, BLACK, (0, scoreboard_y, WINDOW_WIDTH, 100))
-        pygame.draw.line(self.screen, WHITE, (0, scoreboard_y), (WINDOW_WIDTH, scoreboard_y), 2)
+    def build_minimap_surface(self):
+        minimap = self.minimap
+        scale = max(1, MINIMAP_WIDTH // minimap['columns'])
+        surface = pygame.Surface((minimap['columns'] * scale, minimap['rows'] * scale)).convert()
+        surface.fill((10, 10, 20))
+        counts = minimap['counts']
+        for index, count in enumerate(counts):
+            if count:
+                row, column = divmod(index, minimap['columns'])
+                shade = min(255, 80 + count * 35)
+                surface.fill((shade, 40, 40), (column * scale, row * scale, scale, scale))
+        pygame.draw.rect(surface, GRAY, surface.get_rect(), 1)
+        return surface, scale
+
+    def draw_minimap(self, me):
+        # Chỉ có khi server bật minimap; vẽ lại mỗi frame ở góc trên phải, đè lên mê cung
+        if self.minimap is None:
+            return None
+        if self.minimap_surface is None:
+            self.minimap_surface = self.build_minimap_surface()
+        surface, scale = self.minimap_surface
+        rect = self.screen.blit(surface, (self.view_width - surface.get_width() - 10, 10))
+        if me is not None:
+            sector_size = self.minimap['sector_size']
+            marker = (rect.x + int(me['x']) // sector_size * scale, rect.y + int(me['y']) // sector_size * scale,
+                      scale, scale)
+            self.screen.fill(GREEN, marker)
+        return rect
+
+    def draw_scoreboard(self, state):
+        if self.scoreboard_version == state.version:
+            return None
+        self.scoreboard_version = state.version
+        
+        scoreboard_y = self.view_height
+        pygame.draw.rect(self.screen, BLACK, (0, scoreboard_y, self.view_width, SCOREBOARD_HEIGHT))
+        pygame.draw.line(self.screen, WHITE, (0, scoreboard_y), (self.view_width, scoreboard_y), 2)
         
-        title = self.font.render("Scoreboard", True, WHITE)
+        title = self.render_text(self.font, "Scoreboard", WHITE)
         self.screen.blit(title, (20, scoreboard_y + 10))
         
         y_offset = scoreboard_y + 40
         x_position = 20
-        for player_id, player in sorted(self.players.items(), key=lambda x: x[1]['score'], reverse=True):
+        for player_id, player in sorted(state.players.items(), key=lambda x: x[1]['score'], reverse=True):
             name = player.get('name', f"Player {player_id}")
             player_text = f"{name}: {player['score']} score(s)"
             color = GREEN if str(player_id) == str(self.player_id) else WHITE
-            player_surface = self.font.render(player_text, True, color)
+            player_surface = self.render_text(self.font, player_text, color)
             self.screen.blit(player_surface, (x_position, y_offset))
             x_position += 220 
-            if x_position > WINDOW_WIDTH - 220:
+            if x_position > self.view_width - 220:
                 x_position = 20
                 y_offset += 25
         
-        status_x = WINDOW_WIDTH - 300
+        status_x = self.view_width - 300
         status_y = scoreboard_y + 10
-        status_title = self.font.render("Status", True, WHITE)
+        status_title = self.render_text(self.font, "Status", WHITE)
         self.screen.blit(status_title, (status_x, status_y))
         
-        # Hiển thị tối đa 5 trạng thái, trạng thái mới nhất ở dưới cùng
-        visible_status = self.status_messages[-5:] if len(self.status_messages) > 5 else self.status_messages
-        for i, msg in enumerate(visible_status):
-            # Chỉ hiển thị nếu msg là chuỗi hợp lệ (không phải JSON thô)
-            if isinstance(msg, str) and not msg.startswith("{"):
-                status_surface = self.font.render(msg, True, YELLOW)
-                self.screen.blit(status_surface, (status_x, status_y + 25 + i * 18))
+        # Hiển thị tối đa 5 sự kiện, sự kiện mới nhất ở dưới cùng
+        for i, event in enumerate(state.events[-5:]):
+            text, color = self.format_event(event)
+            status_surface = self.render_text(self.font, text, color)
+            self.screen.blit(status_surface, (status_x, status_y + 25 + i * 18))
+        return pygame.Rect(0, scoreboard_y, self.view_width, SCOREBOARD_HEIGHT)
+
+    def format_event(self, event):
+        if event['type'] == 'kill':
+            return f"{event['shooter']} just vaporized {event['victim']}", YELLOW
+        if event['type'] == 'join':
+            return f"{event['name']} started!", GREEN
+        return f"{event['name']} left", GRAY
 
     def run(self):
         last_shoot_time = 0
@@ -214,14 +530,11 @@ class GameClient:
                 if event.type == pygame.QUIT:
                     self.running = False
                 elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_UP:
-                        self.send_action('move', direction='up')
-                    elif event.key == pygame.K_DOWN:
-                        self.send_action('move', direction='down')
-                    elif event.key == pygame.K_LEFT:
-                        self.send_action('move', direction='left')
-                    elif event.key == pygame.K_RIGHT:
-                        self.send_action('move', direction='right')
+                    if event.key in DIRECTION_KEYS and self.player_id == SPECTATOR_ID:
+                        if event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                            self.follow_next(1 if event.key == pygame.K_RIGHT else -1)
+                    elif event.key in DIRECTION_KEYS:
+                        self.move(DIRECTION_KEYS[event.key])
                     elif event.key == pygame.K_SPACE:
                         current_time = pygame.time.get_ticks()
                         if current_time - last_shoot_time > 500:
@@ -230,20 +543,32 @@ class GameClient:
                     elif event.key == pygame.K_q:
                         self.running = False
             
-            self.screen.fill(BLACK)
-            with self.lock:
-                if self.maze:
-                    self.draw_maze()
-                    self.draw_players()
-                    self.draw_bullets()
-                    self.draw_scoreboard()
+            # Đọc tham chiếu một lần: cả frame vẽ trên cùng một ảnh chụp, luồng mạng vẫn nhận tiếp
+            state = self.state
+            self.sync(state)
+            dirty = self.render_frame(state) if self.maze else None
             
-            pygame.display.flip()
+            if dirty is None:
+                self.screen.fill(BLACK)
+                pygame.display.flip()
+            elif dirty:
+                pygame.display.update(dirty)
             self.clock.tick(FPS)
         
         self.client_socket.close()
+        self.close_udp()
         pygame.quit()
 
 if __name__ == "__main__":
-    client = GameClient()
+    parser = argparse.ArgumentParser(description="Zace Game Client")
+    parser.add_argument('--json', action='store_true',
+                        help='Send JSON frames instead of the binary encoding (debugging)')
+    parser.add_argument('--udp', action='store_true',
+                        help='Receive updates and send inputs over UDP if the server offers it')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5555,
+                        help='Server port, or the port of a relay.py to watch the match as a spectator')
+    args = parser.parse_args()
+    
+    client = GameClient(args.host, args.port, debug=args.json, udp=args.udp)
     client.run()
\ No newline at end of file
@@ -0,0 +1,104 @@
+import random
+
+from bullets import ArrayBulletStore, BulletStore, np
+from grid import OccupancyGrid
+from journal import EventJournal
+from maze import generate_maze
+from navigation import OPEN_DIRECTIONS, open_direction_masks
+from protocol import DIRECTION_DX, DIRECTION_DY, DIRECTIONS
+from records import Player
+
+# Số tick mỗi giây mặc định khi chạy trên server (server.py --tick-rate)
+TICK_RATE = 4
+
+class GameEngine:
+    # Luật chơi thuần: di chuyển, bắn, tính điểm, hồi sinh. Không socket, không thread, không sleep,
+    # mỗi step() là một tick; GameServer thêm mạng và khóa bên ngoài.
+    def __init__(self, maze_width=32, maze_height=16, maze_seed=None, seed=None, numpy_bullets=False):
+        self.players = {}
+        self.next_bullet_id = 1
+        # Luôn biết seed của mê cung để client dựng lại được bản đồ lớn mà không cần nhận từng ô
+        self.maze_seed = random.getrandbits(63) if maze_seed is None else maze_seed
+        self.maze = generate_maze(maze_width, maze_height, self.maze_seed)
+        # Mọi lựa chọn ngẫu nhiên của game (vị trí, hướng hồi sinh) đi qua RNG riêng có seed để replay được
+        self.seed = random.getrandbits(63) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        if numpy_bullets and np is None:
+            print("NumPy is not installed, falling back to the list bullet store")
+            numpy_bullets = False
+        self.grid = OccupancyGrid(self.maze, track_mask=numpy_bullets)
+        self.open_masks = open_direction_masks(self.maze)
+        self.bullet_store = ArrayBulletStore(self.maze) if numpy_bullets else BulletStore()
+        self.journal = EventJournal()
+        self.ticks = 0
+        self.shots = 0
+        self.kills = 0
+
+    def get_random_empty_position(self):
+        position = self.grid.random_free_cell(self.rng)
+        if position is None:
+            raise RuntimeError("No free cell left in the maze")
+        return position
+
+    def spawn_player(self, player_id, name):
+        x, y = self.get_random_empty_position()
+        self.grid.place(player_id, x, y)
+        player = self.players[player_id] = Player(x, y, self.rng.randrange(len(DIRECTIONS)), name)
+        self.journal.append('join', name=name)
+        return player
+
+    def remove_player(self, player_id):
+        player = self.players.pop(player_id, None)
+        if player is not None:
+            self.grid.remove(player.x, player.y)
+            self.journal.append('leave', name=player.name)
+        return player
+
+    def move(self, player_id, direction):
+        player = self.players[player_id]
+        player.direction = direction
+        new_x = player.x + DIRECTION_DX[direction]
+        new_y = player.y + DIRECTION_DY[direction]
+
+        if self.grid.is_open(new_x, new_y):
+            self.grid.move(player_id, player.x, player.y, new_x, new_y)
+            player.x = new_x
+            player.y = new_y
+
+    def shoot(self, player_id):
+        player = self.players[player_id]
+        if not self.bullet_store.recently_fired(player_id):
+            self.bullet_store.spawn(self.next_bullet_id, player.x, player.y, player.direction, player_id)
+            self.next_bullet_id += 1
+            self.shots += 1
+            player.score -= 1
+
+    def step(self):
+        self.bullet_store.step(self.grid, self.on_bullet_hit)
+        self.ticks += 1
+
+    def on_bullet_hit(self, owner, hit_player):
+        shooter = self.players.get(owner)
+        if shooter is not None:
+            shooter.score += 11
+        victim = self.players[hit_player]
+        victim.score -= 5
+        self.kills += 1
+
+        # Chọn chỗ hồi sinh trước khi nhả ô hiện tại như bản gốc, để không hồi sinh ngay tại ô vừa trúng đạn;
+        # chỉ khi không còn ô trống nào khác mới hồi sinh tại chỗ
+        position = self.grid.random_free_cell(self.rng)
+        x, y = position if position is not None else (victim.x, victim.y)
+        self.grid.move(hit_player, victim.x, victim.y, x, y)
+        victim.x = x
+        victim.y = y
+        # Hồi sinh quay về một hướng không phải tường, tra bảng các hướng mở của ô
+        options = OPEN_DIRECTIONS[self.open_masks[self.grid.index(x, y)]]
+        if options:
+            victim.direction = options[self.rng.randrange(len(options))]
+        else:
+            victim.direction = self.rng.randrange(len(DIRECTIONS))
+
+        shooter_name = shooter.name if shooter is not None else f"Player{owner}"
+        self.journal.append('kill', shooter=shooter_name, victim=victim.name)
+        return x, y
@@ -0,0 +1,86 @@
+import random
+
+from array import array
+
+from maze import maze_cells
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class OccupancyGrid:
+    def __init__(self, maze, track_mask=False):
+        self.height = len(maze)
+        self.width = len(maze[0]) if self.height else 0
+        # Mê cung lớn có hàng triệu ô: dùng bytearray/array thay cho list và dict
+        self.walls = bytearray(maze_cells(maze))
+        self.occupants = [None] * (self.width * self.height)
+        # Bản sao dạng mảng NumPy của các ô có người, dùng cho xử lý đạn theo lô
+        self.occupied_mask = np.zeros(self.width * self.height, dtype=bool) if track_mask else None
+
+        # Danh sách ô trống + vị trí của từng ô trong danh sách để xóa O(1)
+        self.free_cells = array('l', (index for index, wall in enumerate(self.walls) if not wall))
+        self.free_slots = array('l', [-1]) * len(self.walls)
+        for slot, index in enumerate(self.free_cells):
+            self.free_slots[index] = slot
+
+    def index(self, x, y):
+        return y * self.width + x
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def is_wall(self, x, y):
+        return not self.in_bounds(x, y) or self.walls[y * self.width + x]
+
+    def is_open(self, x, y):
+        if not self.in_bounds(x, y):
+            return False
+        index = y * self.width + x
+        return not self.walls[index] and self.occupants[index] is None
+
+    def occupant_at(self, x, y):
+        if not self.in_bounds(x, y):
+            return None
+        return self.occupants[y * self.width + x]
+
+    def place(self, entity_id, x, y):
+        index = self.index(x, y)
+        self.occupants[index] = entity_id
+        if self.occupied_mask is not None:
+            self.occupied_mask[index] = True
+        self._take_free(index)
+
+    def remove(self, x, y):
+        index = self.index(x, y)
+        self.occupants[index] = None
+        if self.occupied_mask is not None:
+            self.occupied_mask[index] = False
+        self._add_free(index)
+
+    def move(self, entity_id, x, y, new_x, new_y):
+        self.remove(x, y)
+        self.place(entity_id, new_x, new_y)
+
+    def random_free_cell(self, rng=random):
+        if not self.free_cells:
+            return None
+        index = self.free_cells[rng.randrange(len(self.free_cells))]
+        return index % self.width, index // self.width
+
+    def _take_free(self, index):
+        slot = self.free_slots[index]
+        if slot < 0:
+            return
+        self.free_slots[index] = -1
+        last = self.free_cells.pop()
+        if last != index:
+            self.free_cells[slot] = last
+            self.free_slots[last] = slot
+
+    def _add_free(self, index):
+        if self.walls[index] or self.free_slots[index] >= 0:
+            return
+        self.free_slots[index] = len(self.free_cells)
+        self.free_cells.append(index)
@@ -0,0 +1,71 @@
+# Chia bản đồ thành các sector vuông; mỗi client chỉ nhận người chơi/đạn trong các sector quanh mình
+SECTOR_SIZE = 8
+# Nửa chiều rộng/cao (ô) của vùng quan tâm quanh người chơi, lớn hơn khung nhìn của client một chút
+AOI_HALF_WIDTH = 24
+AOI_HALF_HEIGHT = 14
+
+class InterestGrid:
+    def __init__(self, width, height, sector_size=SECTOR_SIZE, half_width=AOI_HALF_WIDTH,
+                 half_height=AOI_HALF_HEIGHT):
+        self.width = width
+        self.height = height
+        self.sector_size = sector_size
+        self.columns = -(-width // sector_size)
+        self.rows = -(-height // sector_size)
+        self.half_width = half_width
+        self.half_height = half_height
+
+    def window(self, x, y):
+        # (cột đầu, hàng đầu, cột cuối, hàng cuối) của các sector phủ vùng quan tâm, tính cả hai đầu.
+        # Làm tròn theo sector nên các client đứng gần nhau dùng chung một window (và một thân update).
+        # Camera của client bị chặn ở mép bản đồ (client.camera_for) chứ không luôn lấy người chơi làm tâm,
+        # nên tâm vùng quan tâm cũng được đẩy vào trong như vậy để vẫn phủ hết khung nhìn.
+        x = min(max(x, self.half_width), self.width - 1 - self.half_width)
+        y = min(max(y, self.half_height), self.height - 1 - self.half_height)
+        size = self.sector_size
+        return (max(0, (x - self.half_width) // size),
+                max(0, (y - self.half_height) // size),
+                min(self.columns - 1, (x + self.half_width) // size),
+                min(self.rows - 1, (y + self.half_height) // size))
+
+    def contains(self, window, x, y):
+        size = self.sector_size
+        return window[0] <= x // size <= window[2] and window[1] <= y // size <= window[3]
+
+    def index(self, players, bullets):
+        # players: {id: (x, y, ...)}, bullets: {id: (id, x, y, ...)} như trong snapshot
+        size = self.sector_size
+        sectors = {}
+        for player_id, row in players.items():
+            sector = sectors.setdefault((row[0] // size, row[1] // size), ([], []))
+            sector[0].append(player_id)
+        for bullet_id, row in bullets.items():
+            sector = sectors.setdefault((row[1] // size, row[2] // size), ([], []))
+            sector[1].append(bullet_id)
+        return sectors
+
+    def select(self, snapshot, window):
+        # Người chơi/đạn của snapshot nằm trong window; chi phí theo số sector và mật độ, không theo tổng dân số
+        players = snapshot['players']
+        bullets = snapshot['bullets']
+        sectors = snapshot['sectors']
+        visible_players = {}
+        visible_bullets = {}
+        for sector_y in range(window[1], window[3] + 1):
+            for sector_x in range(window[0], window[2] + 1):
+                sector = sectors.get((sector_x, sector_y))
+                if sector is None:
+                    continue
+                for player_id in sector[0]:
+                    visible_players[player_id] = players[player_id]
+                for bullet_id in sector[1]:
+                    visible_bullets[bullet_id] = bullets[bullet_id]
+        return visible_players, visible_bullets
+
+    def summary(self, sectors):
+        # Số người chơi mỗi sector (tối đa 255), theo hàng, cho minimap
+        counts = bytearray(self.columns * self.rows)
+        for (sector_x, sector_y), sector in sectors.items():
+            if sector[0]:
+                counts[sector_y * self.columns + sector_x] = min(255, len(sector[0]))
+        return bytes(counts)
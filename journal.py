@@ -0,0 +1,26 @@
+from collections import deque
+from itertools import islice
+
+JOURNAL_SIZE = 256
+
+class EventJournal:
+    # Vòng đệm sự kiện có id tăng dần; client nào tụt quá xa chỉ mất các sự kiện cũ nhất
+    def __init__(self, size=JOURNAL_SIZE):
+        self.events = deque(maxlen=size)
+        self.last_id = 0
+
+    def append(self, event_type, **fields):
+        self.last_id += 1
+        event = {'id': self.last_id, 'type': event_type, **fields}
+        self.events.append(event)
+        return event
+
+    def since(self, cursor, until=None):
+        # Các sự kiện có cursor < id <= until
+        if until is None:
+            until = self.last_id
+        if not self.events or cursor >= until:
+            return []
+        oldest = self.events[0]['id']
+        start = max(0, cursor + 1 - oldest)
+        return list(islice(self.events, start, max(start, until - oldest + 1)))
@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import multiprocessing
+import queue
+import random
+import signal
+import sys
+import threading
+
+from protocol import ProtocolError, encode_message, frame, read_frame_async
+from engine import TICK_RATE
+from scheduler import tick_rate_arg
+from server import GameServer
+
+REPORT_INTERVAL = 0.5
+REBALANCE_INTERVAL = 5.0
+# Chỉ chuyển người chơi khi phòng đông nhất hơn phòng vắng nhất ít nhất chừng này
+REBALANCE_THRESHOLD = 4
+
+def run_room(room_index, host, port, loads, commands, use_async, server_options):
+    # Tiến trình con được fork sẽ thừa hưởng trạng thái random của cha: gieo lại để mỗi phòng có mê cung riêng
+    random.seed()
+    server_options = dict(server_options)
+    if server_options.get('maze_seed') is not None:
+        server_options['maze_seed'] += room_index
+    if use_async:
+        from async_server import AsyncGameServer
+        server = AsyncGameServer(host, port, **server_options)
+    else:
+        server = GameServer(host, port, **server_options)
+    threading.Thread(target=room_control_loop, args=(server, room_index, loads, commands), daemon=True).start()
+    server.start()
+
+def room_control_loop(server, room_index, loads, commands):
+    while True:
+        # Bot của phòng không tính vào tải: chúng tự rút đi khi người chơi thật vào
+        loads[room_index] = len(server.players) - len(server.bots or ())
+        try:
+            command = commands.get(timeout=REPORT_INTERVAL)
+        except queue.Empty:
+            continue
+        if command[0] == 'migrate':
+            _, count, host, port = command
+            print(f"Room {room_index}: moving {count} player(s) to {host}:{port}")
+            server.redirect_clients(count, host, port)
+
+class Lobby:
+    def __init__(self, host='127.0.0.1', port=5555, rooms=2, room_host='127.0.0.1', base_port=5556,
+                 use_async=False, debug=False, **server_options):
+        # server_options được chuyển nguyên cho GameServer của từng phòng (numpy_bullets, maze_*...)
+        self.host = host
+        self.port = port
+        self.room_host = room_host
+        self.room_ports = [base_port + i for i in range(rooms)]
+        self.debug = debug
+        self.loads = multiprocessing.Array('i', rooms, lock=False)
+        # Số client đã được chỉ định nhưng phòng chưa kịp báo lại tải
+        self.pending = [0] * rooms
+        self.commands = [multiprocessing.Queue() for _ in range(rooms)]
+        self.workers = [
+            multiprocessing.Process(target=run_room, daemon=True,
+                                    args=(i, room_host, room_port, self.loads, self.commands[i],
+                                          use_async, dict(server_options, debug=debug)))
+            for i, room_port in enumerate(self.room_ports)
+        ]
+
+    def room_load(self, index):
+        return self.loads[index] + self.pending[index]
+
+    def pick_room(self):
+        index = min(range(len(self.room_ports)), key=self.room_load)
+        self.pending[index] += 1
+        return index
+
+    async def handle_connection(self, reader, writer):
+        try:
+            # Đọc hết frame join trước khi đóng để client không nhận RST
+            await read_frame_async(reader)
+
+            index = self.pick_room()
+            redirect = {'type': 'redirect', 'host': self.room_host, 'port': self.room_ports[index]}
+            writer.write(frame(encode_message(redirect, self.debug)))
+            await writer.drain()
+            print(f"Client from {writer.get_extra_info('peername')} assigned to room {index}")
+        except (asyncio.IncompleteReadError, ProtocolError, OSError) as e:
+            print(f"Lobby connection error: {e}")
+        finally:
+            writer.close()
+
+    async def balance_loop(self):
+        elapsed = 0.0
+        while True:
+            await asyncio.sleep(REPORT_INTERVAL)
+            self.pending = [0] * len(self.room_ports)
+            elapsed += REPORT_INTERVAL
+            if elapsed < REBALANCE_INTERVAL:
+                continue
+            elapsed = 0.0
+
+            rooms = range(len(self.room_ports))
+            busiest = max(rooms, key=self.room_load)
+            emptiest = min(rooms, key=self.room_load)
+            difference = self.room_load(busiest) - self.room_load(emptiest)
+            if difference >= REBALANCE_THRESHOLD:
+                count = difference // 2
+                self.commands[busiest].put(('migrate', count, self.room_host, self.room_ports[emptiest]))
+                self.pending[emptiest] += count
+
+    async def serve(self):
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port, backlog=1024)
+        print(f"Lobby started on {self.host}:{self.port} with {len(self.room_ports)} room(s)")
+        async with server:
+            balance_task = asyncio.create_task(self.balance_loop())
+            try:
+                await server.serve_forever()
+            finally:
+                balance_task.cancel()
+
+    def start(self):
+        # Thoát bình thường khi bị terminate để multiprocessing dọn các phòng (daemon) theo
+        signal.signal(signal.SIGTERM, lambda signum, stack: sys.exit(0))
+        for worker in self.workers:
+            worker.start()
+        asyncio.run(self.serve())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Zace Game Lobby")
+    parser.add_argument('--rooms', type=int, default=max(1, multiprocessing.cpu_count()),
+                        help='Number of room worker processes')
+    parser.add_argument('--port', type=int, default=5555, help='Port the lobby listens on')
+    parser.add_argument('--base-port', type=int, default=5556, help='Port of the first room')
+    parser.add_argument('--room-host', default='127.0.0.1', help='Address clients use to reach the rooms')
+    parser.add_argument('--json', action='store_true',
+                        help='Send JSON frames instead of the binary encoding (debugging)')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Run each room on a single asyncio event loop')
+    parser.add_argument('--numpy-bullets', action='store_true',
+                        help='Simulate bullets with NumPy arrays (requires numpy)')
+    parser.add_argument('--maze-width', type=int, default=32, help='Maze width in cells (rounded up to odd)')
+    parser.add_argument('--maze-height', type=int, default=16, help='Maze height in cells (rounded up to odd)')
+    parser.add_argument('--maze-seed', type=int, default=None,
+                        help='Seed for reproducible mazes (room i uses seed + i)')
+    parser.add_argument('--no-aoi', dest='aoi', action='store_false',
+                        help='Send every player and bullet to every client instead of only nearby ones')
+    parser.add_argument('--minimap', action='store_true',
+                        help='Periodically send every client a per-sector player count summary')
+    parser.add_argument('--bots', type=int, default=0,
+                        help='Fill each room with server-run AI players until it has this many players')
+    parser.add_argument('--udp', action='store_true',
+                        help='Let room clients receive updates and send inputs over UDP')
+    parser.add_argument('--tick-rate', type=tick_rate_arg, default=TICK_RATE, help='Simulation ticks per second in each room')
+    args = parser.parse_args()
+
+    lobby = Lobby(port=args.port, rooms=args.rooms, room_host=args.room_host, base_port=args.base_port,
+                  use_async=args.use_async, debug=args.json, numpy_bullets=args.numpy_bullets,
+                  maze_width=args.maze_width, maze_height=args.maze_height, maze_seed=args.maze_seed,
+                  aoi=args.aoi, minimap=args.minimap, udp=args.udp, bots=args.bots,
+                  tick_rate=args.tick_rate)
+    lobby.start()
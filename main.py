@@ -3,36 +3,111 @@ import sys
 import subprocess
 import argparse
 
-def start_server():
+from scheduler import tick_rate_arg
+
+def start_server(extra_args=()):
     print("Starting server...")
-    server_process = subprocess.Popen([sys.executable, "server.py"])
+    server_process = subprocess.Popen([sys.executable, "server.py", *extra_args])
     return server_process
 
-def start_client():
+def start_lobby(rooms, extra_args=()):
+    print(f"Starting lobby with {rooms} rooms...")
+    lobby_process = subprocess.Popen([sys.executable, "lobby.py", "--rooms", str(rooms), *extra_args])
+    return lobby_process
+
+def start_bots(count, extra_args=()):
+    print(f"Starting {count} bots...")
+    bot_process = subprocess.Popen([sys.executable, "bot.py", "--clients", str(count), *extra_args])
+    return bot_process
+
+def start_relay(server_port, port, extra_args=()):
+    print(f"Starting spectator relay on port {port}...")
+    relay_process = subprocess.Popen([sys.executable, "relay.py", "--server-port", str(server_port),
+                                      "--port", str(port), *extra_args])
+    return relay_process
+
+def start_client(extra_args=()):
     print("Starting client...")
-    client_process = subprocess.Popen([sys.executable, "client.py"])
+    client_process = subprocess.Popen([sys.executable, "client.py", *extra_args])
     return client_process
 
 def main():
     parser = argparse.ArgumentParser(description="Zace Game Launcher")
-    parser.add_argument('--mode', choices=['server', 'client', 'both'], default='both', 
-                        help='Start as server, client, or both')
+    parser.add_argument('--mode', choices=['server', 'client', 'both', 'bots', 'bench'], default='both', 
+                        help='Start as server, client, both, headless bots, or run a load benchmark')
     parser.add_argument('--clients', type=int, default=1, 
-                        help='Number of clients to start (only relevant when mode is both)')
+                        help='Number of clients (mode both/client) or bots (mode bots/bench) to start')
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help='Measured seconds (only relevant when mode is bench)')
+    parser.add_argument('--json', action='store_true',
+                        help='Use JSON frames instead of the binary encoding (debugging)')
+    parser.add_argument('--server-core', choices=['threaded', 'async'], default='threaded',
+                        help='Thread-per-connection server or single asyncio event loop')
+    parser.add_argument('--numpy-bullets', action='store_true',
+                        help='Simulate bullets with NumPy arrays on the server (requires numpy)')
+    parser.add_argument('--rooms', type=int, default=1,
+                        help='Number of room worker processes behind a lobby (1 = single server)')
+    parser.add_argument('--maze-width', type=int, default=32, help='Maze width in cells')
+    parser.add_argument('--maze-height', type=int, default=16, help='Maze height in cells')
+    parser.add_argument('--maze-seed', type=int, default=None, help='Seed for a reproducible maze')
+    parser.add_argument('--no-aoi', dest='aoi', action='store_false',
+                        help='Send every client the whole match instead of only nearby entities')
+    parser.add_argument('--minimap', action='store_true', help='Send clients a periodic minimap summary')
+    parser.add_argument('--server-bots', type=int, default=0,
+                        help='Fill the match with server-run AI players until it has this many players')
+    parser.add_argument('--udp', action='store_true',
+                        help='Send updates and inputs over UDP (join and init stay on TCP)')
+    parser.add_argument('--relay-port', type=int, default=None,
+                        help='Also start a spectator relay on this port (watch with: client.py --port PORT)')
+    parser.add_argument('--tick-rate', type=tick_rate_arg, default=None,
+                        help='Server simulation ticks per second (default 4); broadcasts thin out first under load')
     
     args = parser.parse_args()
     
+    if args.mode == 'bench':
+        from bench import run_bench
+        run_bench(clients=args.clients, duration=args.duration, use_async=args.server_core == 'async',
+                  numpy_bullets=args.numpy_bullets, udp=args.udp, tick_rate=args.tick_rate)
+        return
+    
+    extra_args = ['--json'] if args.json else []
+    if args.udp:
+        extra_args.append('--udp')
+    server_args = extra_args + (['--async'] if args.server_core == 'async' else [])
+    if args.numpy_bullets:
+        server_args.append('--numpy-bullets')
+    server_args += ['--maze-width', str(args.maze_width), '--maze-height', str(args.maze_height)]
+    if args.maze_seed is not None:
+        server_args += ['--maze-seed', str(args.maze_seed)]
+    if not args.aoi:
+        server_args.append('--no-aoi')
+    if args.minimap:
+        server_args.append('--minimap')
+    if args.server_bots:
+        server_args += ['--bots', str(args.server_bots)]
+    if args.tick_rate is not None:
+        server_args += ['--tick-rate', str(args.tick_rate)]
     processes = []
     
     if args.mode == 'server' or args.mode == 'both':
-        server_process = start_server()
+        if args.rooms > 1:
+            server_process = start_lobby(args.rooms, server_args)
+        else:
+            server_process = start_server(server_args)
         processes.append(server_process)
+        if args.relay_port is not None:
+            # Relay xem một phòng trực tiếp (phòng đầu tiên khi chạy sau lobby)
+            processes.append(start_relay(5556 if args.rooms > 1 else 5555, args.relay_port,
+                                         ['--json'] if args.json else []))
     
     if args.mode == 'client' or args.mode == 'both':
         for _ in range(args.clients):
-            client_process = start_client()
+            client_process = start_client(extra_args)
             processes.append(client_process)
     
+    if args.mode == 'bots':
+        processes.append(start_bots(args.clients, extra_args))
+    
     try:
         for process in processes:
             process.wait()
@@ -49,4 +124,5 @@ if __name__ == "__main__":
 # python main.py --mode server
 # python main.py --mode client
 # ----------------------------
-# python main.py --mode both 
\ No newline at end of file
+# python main.py --mode both
+# python main.py --mode bench --clients 200 
\ No newline at end of file
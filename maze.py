@@ -0,0 +1,79 @@
+import random
+import zlib
+
+def generate_maze(width, height, seed=None):
+    # Cùng seed và kích thước luôn cho cùng mê cung, nên client có thể tự dựng lại từ seed
+    rng = random.Random(seed)
+    if width % 2 == 0:
+        width += 1
+    if height % 2 == 0:
+        height += 1
+
+    # Mảng phẳng 1 byte/ô thay cho list lồng nhau; ô có toạ độ lẻ là nút của cây DFS
+    cells = bytearray(b'\x01') * (width * height)
+    start = rng.randrange(1, height, 2) * width + rng.randrange(1, width, 2)
+    cells[start] = 0
+    stack = [start]
+
+    while stack:
+        index = stack[-1]
+        y, x = divmod(index, width)
+        options = []
+        if y > 1 and cells[index - 2 * width]:
+            options.append(-width)
+        if x < width - 2 and cells[index + 2]:
+            options.append(1)
+        if y < height - 2 and cells[index + 2 * width]:
+            options.append(width)
+        if x > 1 and cells[index - 2]:
+            options.append(-1)
+        if not options:
+            stack.pop()
+            continue
+        step = options[rng.randrange(len(options))]
+        cells[index + step] = 0
+        cells[index + 2 * step] = 0
+        stack.append(index + 2 * step)
+
+    for _ in range(width * height // 20):
+        x = rng.randrange(1, width - 1, 2)
+        y = rng.randrange(1, height - 1, 2)
+        dx, dy = rng.choice([(0, 1), (1, 0), (0, -1), (-1, 0)])
+        nx, ny = x + dx, y + dy
+        if 0 < nx < width - 1 and 0 < ny < height - 1:
+            cells[ny * width + nx] = 0
+
+    for _ in range(4):
+        side = rng.randint(0, 3)
+        if side == 0:
+            cells[width + rng.randrange(1, width - 1, 2)] = 0
+        elif side == 1:
+            cells[rng.randrange(1, height - 1, 2) * width + width - 2] = 0
+        elif side == 2:
+            cells[(height - 2) * width + rng.randrange(1, width - 1, 2)] = 0
+        else:
+            cells[rng.randrange(1, height - 1, 2) * width + 1] = 0
+
+    return [bytes(cells[y * width:(y + 1) * width]) for y in range(height)]
+
+def maze_cells(maze):
+    return b''.join(bytes(row) for row in maze)
+
+def maze_checksum(maze):
+    return zlib.crc32(maze_cells(maze))
+
+_TO_DIGITS = bytes.maketrans(b'\x00\x01', b'01')
+_FROM_DIGITS = bytes.maketrans(b'01', b'\x00\x01')
+
+def pack_cells(cells):
+    # 8 ô/byte; đi qua chuỗi nhị phân để việc chuyển đổi chạy trong C
+    padded = cells + bytes(-len(cells) % 8)
+    if not padded:
+        return b''
+    return int(padded.translate(_TO_DIGITS), 2).to_bytes(len(padded) // 8, 'big')
+
+def unpack_cells(data, count):
+    if not count:
+        return b''
+    digits = format(int.from_bytes(data, 'big'), f'0{len(data) * 8}b').encode()
+    return digits[:count].translate(_FROM_DIGITS)
@@ -0,0 +1,92 @@
+from collections import deque
+
+from maze import maze_cells
+
+# Các hướng mở theo bitmask 4 bit (bit d = đi được theo hướng mã d), tra bảng thay cho thử-lại ngẫu nhiên
+OPEN_DIRECTIONS = tuple(tuple(code for code in range(4) if mask >> code & 1) for mask in range(16))
+OPPOSITE = (1, 0, 3, 2)
+NO_HOP = 255
+# Số điểm mốc có trường BFS riêng (mỗi trường 1 byte/ô) và tầm nhìn tối đa (ô) lưu trong bảng
+WAYPOINTS = 16
+SIGHT_RANGE = 12
+
+def open_direction_masks(maze):
+    # Một byte mỗi ô: bitmask các hướng (theo protocol.DIRECTIONS) dẫn tới ô không phải tường
+    height = len(maze)
+    width = len(maze[0]) if height else 0
+    walls = maze_cells(maze)
+    masks = bytearray(width * height)
+    for index, wall in enumerate(walls):
+        if wall:
+            continue
+        y, x = divmod(index, width)
+        mask = 0
+        if y > 0 and not walls[index - width]:
+            mask |= 1
+        if y < height - 1 and not walls[index + width]:
+            mask |= 2
+        if x > 0 and not walls[index - 1]:
+            mask |= 4
+        if x < width - 1 and not walls[index + 1]:
+            mask |= 8
+        masks[index] = mask
+    return masks
+
+class NavigationTables:
+    # Tính một lần cho mỗi mê cung (mê cung không đổi trong trận):
+    #   sight[index * 4 + d]  số ô trống nhìn thấy theo hướng d trước khi gặp tường (tối đa SIGHT_RANGE)
+    #   toward[w][index]      hướng đi bước kế tiếp từ ô index về điểm mốc w (BFS), NO_HOP nếu đã tới
+    # nên mỗi bước của bot chỉ là vài phép tra bảng, không tìm đường trong tick.
+    def __init__(self, maze, open_masks, waypoints=WAYPOINTS, sight_range=SIGHT_RANGE):
+        self.height = len(maze)
+        self.width = len(maze[0]) if self.height else 0
+        self.open_masks = open_masks
+        self.steps = (-self.width, self.width, -1, 1)
+        self.sight = self.build_sight(sight_range)
+        self.waypoints = []
+        self.toward = []
+        self.build_fields(waypoints)
+
+    def build_sight(self, sight_range):
+        # Quy hoạch động: tầm nhìn của một ô = tầm nhìn của ô kế tiếp theo hướng đó + 1
+        masks = self.open_masks
+        sight = bytearray(len(masks) * 4)
+        for code, step in enumerate(self.steps):
+            bit = 1 << code
+            order = range(len(masks) - 1, -1, -1) if step > 0 else range(len(masks))
+            for index in order:
+                if masks[index] & bit:
+                    sight[index * 4 + code] = min(sight_range, sight[(index + step) * 4 + code] + 1)
+        return sight
+
+    def build_fields(self, count):
+        # Chọn điểm mốc xa nhau (xa nhất so với các mốc đã chọn), mỗi mốc một trường BFS
+        masks = self.open_masks
+        start = next((index for index, mask in enumerate(masks) if mask), None)
+        if start is None:
+            return
+        nearest = [len(masks)] * len(masks)
+        waypoint = start
+        for _ in range(count):
+            toward = bytearray([NO_HOP]) * len(masks)
+            nearest[waypoint] = 0
+            visited = [waypoint]
+            queue = deque([(waypoint, 0)])
+            seen = bytearray(len(masks))
+            seen[waypoint] = 1
+            while queue:
+                index, distance = queue.popleft()
+                for code in OPEN_DIRECTIONS[masks[index]]:
+                    neighbor = index + self.steps[code]
+                    if not seen[neighbor]:
+                        seen[neighbor] = 1
+                        toward[neighbor] = OPPOSITE[code]
+                        if distance + 1 < nearest[neighbor]:
+                            nearest[neighbor] = distance + 1
+                        visited.append(neighbor)
+                        queue.append((neighbor, distance + 1))
+            self.waypoints.append(waypoint)
+            self.toward.append(toward)
+            waypoint = max(visited, key=nearest.__getitem__)
+            if nearest[waypoint] == 0:
+                break
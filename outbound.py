@@ -0,0 +1,181 @@
+import asyncio
+import socket
+import threading
+
+# Client có frame bị thay liên tiếp quá số lần này (không đọc được gì ~5 giây) sẽ bị ngắt;
+# server quy đổi STALE_SECONDS ra số frame theo tick rate của nó
+STALE_SECONDS = 5.0
+MAX_STALE_FRAMES = 20
+# Writer asyncio chờ drain() khi bộ đệm gửi vượt ngưỡng này; trong lúc chờ chỉ giữ frame mới nhất
+MAX_WRITE_BUFFER = 16 * 1024
+
+def send_buffers(connection, buffers):
+    # Gửi nhiều buffer bằng sendmsg mà không nối chúng lại (thân update dùng chung giữa các client);
+    # sendmsg có thể gửi thiếu nên cắt phần đã gửi rồi lặp lại
+    if not hasattr(connection, 'sendmsg'):
+        connection.sendall(b''.join(buffers))
+        return
+    views = [memoryview(buffer) for buffer in buffers]
+    while views:
+        sent = connection.sendmsg(views)
+        while views and sent >= len(views[0]):
+            sent -= len(views[0])
+            views.pop(0)
+        if sent:
+            views[0] = views[0][sent:]
+
+class ClientWriter:
+    # Mỗi client một thread gửi. Chỉ giữ frame update mới nhất chưa gửi: update là delta
+    # theo baseline đã ack nên frame cũ hơn có thể bỏ đi mà client vẫn dựng lại đúng state.
+    # Mỗi frame là một danh sách buffer (xem protocol.frame_parts), có thể dùng chung với client khác.
+    def __init__(self, client_id, connection, stats, max_stale=MAX_STALE_FRAMES):
+        self.client_id = client_id
+        self.connection = connection
+        self.stats = stats
+        self.max_stale = max_stale
+        self.condition = threading.Condition()
+        self.pending = None
+        self.final = None
+        self.stale = 0
+        self.closed = False
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def push(self, buffers):
+        with self.condition:
+            if self.closed or self.final is not None:
+                return
+            if self.pending is not None:
+                self.stats.count_dropped(self.client_id)
+                self.stale += 1
+                if self.stale > self.max_stale:
+                    self.abort()
+                    return
+            self.pending = buffers
+            self.condition.notify()
+
+    def finish(self, final_frame):
+        # Gửi frame cuối (vd. redirect) thay cho mọi update đang chờ rồi đóng chiều gửi
+        with self.condition:
+            self.final = final_frame
+            self.pending = None
+            self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+    def abort(self):
+        print(f"Client {self.client_id} is not reading its updates, disconnecting")
+        self.closed = True
+        self.condition.notify()
+        try:
+            # Đánh thức thread đọc của client (nó sẽ dọn người chơi) và cả sendall đang kẹt
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and self.final is None and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                data, final = self.pending, self.final
+                self.pending = None
+            try:
+                if final is not None:
+                    self.connection.sendall(final)
+                    self.connection.shutdown(socket.SHUT_WR)
+                    return
+                send_buffers(self.connection, data)
+                self.stats.count_out(self.client_id, sum(map(len, data)))
+            except OSError as e:
+                print(f"Error sending to client {self.client_id}: {e}")
+                return
+            with self.condition:
+                self.stale = 0
+
+class AsyncClientWriter:
+    # Giống ClientWriter nhưng là một task trên event loop, chờ drain() khi bộ đệm gửi đầy
+    def __init__(self, client_id, writer, stats, high_water=MAX_WRITE_BUFFER, max_stale=MAX_STALE_FRAMES):
+        self.client_id = client_id
+        self.writer = writer
+        self.stats = stats
+        self.max_stale = max_stale
+        self.pending = None
+        self.final = None
+        self.stale = 0
+        self.closed = False
+        self.ready = asyncio.Event()
+        writer.transport.set_write_buffer_limits(high=high_water)
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def push(self, buffers):
+        if self.closed or self.final is not None:
+            return
+        if self.pending is not None:
+            self.stats.count_dropped(self.client_id)
+            self.stale += 1
+            if self.stale > self.max_stale:
+                self.abort()
+                return
+        self.pending = buffers
+        self.ready.set()
+
+    def finish(self, final_frame):
+        self.final = final_frame
+        self.pending = None
+        self.ready.set()
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+    def abort(self):
+        print(f"Client {self.client_id} is not reading its updates, disconnecting")
+        self.closed = True
+        self.task.cancel()
+        self.writer.transport.abort()
+
+    async def run(self):
+        try:
+            while True:
+                await self.ready.wait()
+                self.ready.clear()
+                if self.closed or self.writer.is_closing():
+                    return
+                if self.final is not None:
+                    self.writer.write(self.final)
+                    self.writer.write_eof()
+                    return
+                data, self.pending = self.pending, None
+                if data is None:
+                    continue
+                self.writer.writelines(data)
+                self.stats.count_out(self.client_id, sum(map(len, data)))
+                await self.writer.drain()
+                self.stale = 0
+        except (ConnectionError, OSError) as e:
+            print(f"Error sending to client {self.client_id}: {e}")
+
+class DatagramWriter:
+    # Chế độ UDP: mỗi update là một gói, gửi ngay, không hàng đợi và không gửi lại. Gói mất hay đến
+    # sai thứ tự đều không sao: client bỏ update cũ và update sau vẫn là delta theo baseline đã ack.
+    def __init__(self, client_id, token, send, stats):
+        self.client_id = client_id
+        self.token = token
+        self.send = send
+        self.stats = stats
+        # Địa chỉ UDP của client, biết được khi nhận gói đầu tiên mang token của nó
+        self.address = None
+
+    def push(self, buffers):
+        # Các buffer ghép thành một gói
+        try:
+            self.send(buffers, self.address)
+        except OSError:
+            self.stats.count_dropped(self.client_id)
+            return
+        self.stats.count_out(self.client_id, sum(map(len, buffers)))
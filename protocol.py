@@ -0,0 +1,514 @@
+import json
+import struct
+
+from maze import generate_maze, maze_cells, maze_checksum, pack_cells, unpack_cells
+
+# Mỗi message đi trong một frame: 4 byte độ dài payload (big-endian) rồi tới payload.
+# Byte đầu của payload cho biết phần còn lại được mã hóa thế nào.
+HEADER = struct.Struct('!I')
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+MSG_JSON = 0
+MSG_JOIN = 1
+MSG_INIT = 2
+MSG_UPDATE = 3
+MSG_MOVE = 4
+MSG_SHOOT = 5
+MSG_ACK = 6
+MSG_REDIRECT = 7
+MSG_MINIMAP = 8
+MSG_UDP = 9
+MSG_INPUTS = 10
+MSG_WATCH = 11
+
+DIRECTIONS = ('up', 'down', 'left', 'right')
+DIRECTION_CODES = {name: code for code, name in enumerate(DIRECTIONS)}
+DIRECTION_DELTAS = {'up': (0, -1), 'down': (0, 1), 'left': (-1, 0), 'right': (1, 0)}
+# Bảng dịch chuyển theo mã hướng, dùng trong các vòng lặp nóng của server
+DIRECTION_DX = tuple(DIRECTION_DELTAS[direction][0] for direction in DIRECTIONS)
+DIRECTION_DY = tuple(DIRECTION_DELTAS[direction][1] for direction in DIRECTIONS)
+
+# Mê cung lớn hơn số ô này chỉ được gửi bằng seed (client tự dựng lại), nhỏ hơn thì gửi bit-packed
+MAZE_INLINE_LIMIT = 64 * 1024
+MAZE_PACKED = 0
+MAZE_SEEDED = 1
+
+# Sự kiện trong update: loại và các trường tên người chơi đi kèm
+EVENT_TYPES = ('join', 'kill', 'leave')
+EVENT_FIELDS = {'join': ('name',), 'kill': ('shooter', 'victim'), 'leave': ('name',)}
+
+# Chế độ UDP: update lớn hơn mức này (để không bị phân mảnh IP) vẫn đi qua TCP
+MAX_DATAGRAM_SIZE = 1400
+# Mỗi gói input UDP gửi lại tối đa chừng này input gần nhất mà server chưa xác nhận
+REDUNDANT_INPUTS = 4
+
+_KIND = struct.Struct('!B')
+_U8 = struct.Struct('!B')
+_U16 = struct.Struct('!H')
+_U32 = struct.Struct('!I')
+_INIT = struct.Struct('!IHHBI')
+_MAZE_SEED = struct.Struct('!QI')
+_PLAYER = struct.Struct('!IHHBi')
+_BULLET = struct.Struct('!IHHBIH')
+_UPDATE = struct.Struct('!III')
+_MOVE = struct.Struct('!BI')
+_EVENT = struct.Struct('!IB')
+_MINIMAP = struct.Struct('!HHH')
+_UDP = struct.Struct('!IH')
+_INPUTS = struct.Struct('!IIB')
+# Mã của 'shoot' trong danh sách input, ngay sau các mã hướng
+_INPUT_SHOOT = len(DIRECTIONS)
+
+class ProtocolError(Exception):
+    pass
+
+class _Reader:
+    def __init__(self, payload, offset=1):
+        self.payload = payload
+        self.offset = offset
+
+    def unpack(self, layout):
+        try:
+            values = layout.unpack_from(self.payload, self.offset)
+        except struct.error as e:
+            raise ProtocolError(f"Truncated payload: {e}")
+        self.offset += layout.size
+        return values
+
+    def take(self, size):
+        end = self.offset + size
+        if end > len(self.payload):
+            raise ProtocolError("Truncated payload")
+        data = self.payload[self.offset:end]
+        self.offset = end
+        return data
+
+    def text(self, length_layout):
+        (length,) = self.unpack(length_layout)
+        try:
+            return bytes(self.take(length)).decode()
+        except UnicodeDecodeError as e:
+            raise ProtocolError(f"Invalid text: {e}")
+
+def _pack_text(parts, text, length_layout, limit):
+    # Cắt theo byte nhưng không được cắt đôi một ký tự UTF-8, nếu không phía nhận không giải mã được
+    data = text.encode()[:limit].decode('utf-8', 'ignore').encode()
+    parts.append(length_layout.pack(len(data)))
+    parts.append(data)
+
+def _pack_direction(direction):
+    try:
+        return DIRECTION_CODES[direction]
+    except KeyError:
+        raise ProtocolError(f"Unknown direction: {direction!r}")
+
+def _check_direction(direction):
+    if not isinstance(direction, str) or direction not in DIRECTION_CODES:
+        raise ProtocolError(f"Unknown direction: {direction!r}")
+
+def _unpack_direction(code):
+    if code >= len(DIRECTIONS):
+        raise ProtocolError(f"Unknown direction code: {code}")
+    return DIRECTIONS[code]
+
+# Server gửi người chơi/đạn dưới dạng row (tuple theo thứ tự trường của struct, hướng là mã số,
+# xem records.py); dict như phía client giải mã ra vẫn được chấp nhận.
+def _player_row(player):
+    if isinstance(player, dict):
+        return (player['x'], player['y'], _pack_direction(player['direction']), player['score'], player['name'])
+    return player
+
+def _bullet_row(bullet):
+    if isinstance(bullet, dict):
+        return (bullet['id'], bullet['x'], bullet['y'], _pack_direction(bullet['direction']),
+                int(bullet['owner']), bullet['distance'])
+    return bullet
+
+def _player_dict(player):
+    x, y, direction, score, name = _player_row(player)
+    return {'x': x, 'y': y, 'direction': _unpack_direction(direction), 'score': score, 'name': name}
+
+def _bullet_dict(bullet):
+    bullet_id, x, y, direction, owner, distance = _bullet_row(bullet)
+    return {'id': bullet_id, 'x': x, 'y': y, 'direction': _unpack_direction(direction),
+            'owner': owner, 'distance': distance}
+
+def _pack_players(parts, players):
+    parts.append(_U32.pack(len(players)))
+    for player_id, player in players.items():
+        x, y, direction, score, name = _player_row(player)
+        parts.append(_PLAYER.pack(int(player_id), x, y, direction, score))
+        _pack_text(parts, name, _U8, 0xFF)
+
+def _unpack_players(reader):
+    (count,) = reader.unpack(_U32)
+    players = {}
+    for _ in range(count):
+        player_id, x, y, direction, score = reader.unpack(_PLAYER)
+        players[player_id] = {
+            'x': x,
+            'y': y,
+            'direction': _unpack_direction(direction),
+            'score': score,
+            'name': reader.text(_U8)
+        }
+    return players
+
+def _pack_bullets(parts, bullets):
+    parts.append(_U32.pack(len(bullets)))
+    for bullet in bullets:
+        parts.append(_BULLET.pack(*_bullet_row(bullet)))
+
+def _unpack_bullets(reader):
+    (count,) = reader.unpack(_U32)
+    bullets = []
+    for _ in range(count):
+        bullet_id, x, y, direction, owner, distance = reader.unpack(_BULLET)
+        bullets.append({
+            'id': bullet_id,
+            'x': x,
+            'y': y,
+            'direction': _unpack_direction(direction),
+            'owner': owner,
+            'distance': distance
+        })
+    return bullets
+
+def _pack_events(parts, events):
+    parts.append(_U32.pack(len(events)))
+    for event in events:
+        event_type = event['type']
+        if event_type not in EVENT_FIELDS:
+            raise ProtocolError(f"Unknown event type: {event_type!r}")
+        parts.append(_EVENT.pack(event['id'], EVENT_TYPES.index(event_type)))
+        for field in EVENT_FIELDS[event_type]:
+            _pack_text(parts, event[field], _U8, 0xFF)
+
+def _unpack_events(reader):
+    (count,) = reader.unpack(_U32)
+    events = []
+    for _ in range(count):
+        event_id, code = reader.unpack(_EVENT)
+        if code >= len(EVENT_TYPES):
+            raise ProtocolError(f"Unknown event code: {code}")
+        event = {'id': event_id, 'type': EVENT_TYPES[code]}
+        for field in EVENT_FIELDS[event['type']]:
+            event[field] = reader.text(_U8)
+        events.append(event)
+    return events
+
+def _pack_ids(parts, ids):
+    parts.append(_U32.pack(len(ids)))
+    parts.extend(_U32.pack(int(item)) for item in ids)
+
+def _unpack_ids(reader):
+    (count,) = reader.unpack(_U32)
+    return [reader.unpack(_U32)[0] for _ in range(count)]
+
+def _encode_join(message):
+    parts = [_KIND.pack(MSG_JOIN)]
+    _pack_text(parts, message.get('name', ''), _U8, 0xFF)
+    if message.get('full_maze'):
+        # Byte tùy chọn sau tên: client cần vẽ mê cung nên xin mê cung bit-packed thay vì seed
+        parts.append(_U8.pack(1))
+    return b''.join(parts)
+
+def _decode_join(reader):
+    message = {'type': 'join', 'name': reader.text(_U8)}
+    if reader.offset < len(reader.payload):
+        (flags,) = reader.unpack(_U8)
+        message['full_maze'] = bool(flags & 1)
+    return message
+
+def _encode_init(message):
+    maze = message['maze']
+    height = len(maze)
+    width = len(maze[0]) if height else 0
+    seed = message.get('maze_seed')
+    encoding = MAZE_SEEDED if seed is not None and width * height > MAZE_INLINE_LIMIT else MAZE_PACKED
+    parts = [_KIND.pack(MSG_INIT), _INIT.pack(message['id'], width, height, encoding, message['history'])]
+    if encoding == MAZE_SEEDED:
+        parts.append(_MAZE_SEED.pack(seed, maze_checksum(maze)))
+    else:
+        parts.append(pack_cells(maze_cells(maze)))
+    _pack_players(parts, message['players'])
+    _pack_bullets(parts, message['bullets'])
+    return b''.join(parts)
+
+def _decode_init(reader):
+    player_id, width, height, encoding, history = reader.unpack(_INIT)
+    seed = None
+    if encoding == MAZE_SEEDED:
+        # Chưa dựng lại ở đây (mê cung 1001x1001 mất cả giây): bot không cần mê cung, ai cần thì gọi build_maze()
+        seed, checksum = reader.unpack(_MAZE_SEED)
+        maze = None
+    elif encoding == MAZE_PACKED:
+        cells = unpack_cells(reader.take((width * height + 7) // 8), width * height)
+        maze = [cells[y * width:(y + 1) * width] for y in range(height)]
+    else:
+        raise ProtocolError(f"Unknown maze encoding: {encoding}")
+    message = {
+        'type': 'init',
+        'id': player_id,
+        'maze': maze,
+        'maze_seed': seed,
+        'history': history,
+        'players': _unpack_players(reader),
+        'bullets': _unpack_bullets(reader)
+    }
+    if encoding == MAZE_SEEDED:
+        message.update(maze_width=width, maze_height=height, maze_checksum=checksum)
+    return message
+
+def build_maze(message):
+    # Mê cung của một init đã giải mã; init chỉ mang seed thì dựng lại và kiểm tra checksum ở đây
+    if message['maze'] is None:
+        width, height = message['maze_width'], message['maze_height']
+        maze = generate_maze(width, height, message['maze_seed'])
+        if len(maze) != height or len(maze[0]) != width or maze_checksum(maze) != message['maze_checksum']:
+            raise ProtocolError("Maze rebuilt from seed does not match the server's")
+        message['maze'] = maze
+    return message['maze']
+
+def encode_update_body(message):
+    parts = []
+    _pack_players(parts, message['players'])
+    _pack_ids(parts, message['removed_players'])
+    _pack_bullets(parts, message['bullets'])
+    _pack_ids(parts, message['removed_bullets'])
+    _pack_events(parts, message.get('events', []))
+    return b''.join(parts)
+
+def encode_update(message, body=None):
+    # Phần thân giống nhau cho mọi client cùng baseline; chỉ phần đầu (input_ack) là riêng
+    if body is None:
+        body = encode_update_body(message)
+    return b''.join(update_parts(message, body, message.get('input_ack', 0)))
+
+def update_parts(message, body, input_ack=0):
+    # Update dạng [phần đầu riêng của client, thân dùng chung]: thân chỉ được mã hóa một lần và
+    # cùng một đối tượng bytes được gửi cho mọi client (sendmsg/writelines), không nối hay chép lại
+    return [_KIND.pack(MSG_UPDATE) + _UPDATE.pack(message['seq'], message['baseline'], input_ack), body]
+
+
+def _decode_update(reader):
+    seq, baseline, input_ack = reader.unpack(_UPDATE)
+    players = _unpack_players(reader)
+    removed_players = _unpack_ids(reader)
+    bullets = _unpack_bullets(reader)
+    removed_bullets = _unpack_ids(reader)
+    events = _unpack_events(reader)
+    return {
+        'type': 'update',
+        'seq': seq,
+        'baseline': baseline,
+        'input_ack': input_ack,
+        'players': players,
+        'removed_players': removed_players,
+        'bullets': bullets,
+        'removed_bullets': removed_bullets,
+        'events': events
+    }
+
+def _encode_move(message):
+    return _KIND.pack(MSG_MOVE) + _MOVE.pack(_pack_direction(message['direction']), message.get('seq', 0))
+
+def _decode_move(reader):
+    direction, seq = reader.unpack(_MOVE)
+    return {'type': 'move', 'direction': _unpack_direction(direction), 'seq': seq}
+
+def _encode_shoot(message):
+    return _KIND.pack(MSG_SHOOT) + _U32.pack(message.get('seq', 0))
+
+def _decode_shoot(reader):
+    (seq,) = reader.unpack(_U32)
+    return {'type': 'shoot', 'seq': seq}
+
+def _encode_ack(message):
+    return _KIND.pack(MSG_ACK) + _U32.pack(message['seq'])
+
+def _decode_ack(reader):
+    (seq,) = reader.unpack(_U32)
+    return {'type': 'ack', 'seq': seq}
+
+def _encode_redirect(message):
+    parts = [_KIND.pack(MSG_REDIRECT)]
+    _pack_text(parts, message['host'], _U8, 0xFF)
+    parts.append(_U16.pack(message['port']))
+    return b''.join(parts)
+
+def _decode_redirect(reader):
+    host = reader.text(_U8)
+    (port,) = reader.unpack(_U16)
+    return {'type': 'redirect', 'host': host, 'port': port}
+
+def _encode_minimap(message):
+    header = _MINIMAP.pack(message['sector_size'], message['columns'], message['rows'])
+    return _KIND.pack(MSG_MINIMAP) + header + bytes(message['counts'])
+
+def _decode_minimap(reader):
+    sector_size, columns, rows = reader.unpack(_MINIMAP)
+    return {
+        'type': 'minimap',
+        'sector_size': sector_size,
+        'columns': columns,
+        'rows': rows,
+        'counts': bytes(reader.take(columns * rows))
+    }
+
+def _encode_udp(message):
+    return _KIND.pack(MSG_UDP) + _UDP.pack(message['token'], message['port'])
+
+def _decode_udp(reader):
+    token, port = reader.unpack(_UDP)
+    return {'type': 'udp', 'token': token, 'port': port}
+
+def _encode_inputs(message):
+    inputs = message['inputs'][-0xFF:]
+    parts = [_KIND.pack(MSG_INPUTS), _INPUTS.pack(message['token'], message['ack'], len(inputs))]
+    for item in inputs:
+        code = _INPUT_SHOOT if item['type'] == 'shoot' else _pack_direction(item['direction'])
+        parts.append(_MOVE.pack(code, item['seq']))
+    return b''.join(parts)
+
+def _encode_watch(message):
+    return _KIND.pack(MSG_WATCH)
+
+def _decode_watch(reader):
+    return {'type': 'watch'}
+
+def _decode_inputs(reader):
+    token, ack, count = reader.unpack(_INPUTS)
+    inputs = []
+    for _ in range(count):
+        code, seq = reader.unpack(_MOVE)
+        if code == _INPUT_SHOOT:
+            inputs.append({'type': 'shoot', 'seq': seq})
+        else:
+            inputs.append({'type': 'move', 'direction': _unpack_direction(code), 'seq': seq})
+    return {'type': 'inputs', 'token': token, 'ack': ack, 'inputs': inputs}
+
+_ENCODERS = {
+    'join': _encode_join,
+    'init': _encode_init,
+    'update': encode_update,
+    'move': _encode_move,
+    'shoot': _encode_shoot,
+    'ack': _encode_ack,
+    'redirect': _encode_redirect,
+    'minimap': _encode_minimap,
+    'udp': _encode_udp,
+    'inputs': _encode_inputs,
+    'watch': _encode_watch
+}
+
+_DECODERS = {
+    MSG_JOIN: _decode_join,
+    MSG_INIT: _decode_init,
+    MSG_UPDATE: _decode_update,
+    MSG_MOVE: _decode_move,
+    MSG_SHOOT: _decode_shoot,
+    MSG_ACK: _decode_ack,
+    MSG_REDIRECT: _decode_redirect,
+    MSG_MINIMAP: _decode_minimap,
+    MSG_UDP: _decode_udp,
+    MSG_INPUTS: _decode_inputs,
+    MSG_WATCH: _decode_watch
+}
+
+def _json_ready(message):
+    # Chế độ JSON gửi người chơi/đạn dạng dict với hướng là chuỗi, như trước khi có row
+    if message['type'] == 'minimap':
+        return dict(message, counts=list(message['counts']))
+    if message['type'] not in ('init', 'update'):
+        return message
+    if message['type'] == 'init':
+        message = dict(message, maze=[list(row) for row in message['maze']])
+    return dict(message,
+                players={player_id: _player_dict(player) for player_id, player in message['players'].items()},
+                bullets=[_bullet_dict(bullet) for bullet in message['bullets']])
+
+def _check_u32(field, value):
+    # seq/ack được server gửi lại trong các struct '!I' nên phải là số nguyên không âm vừa 32 bit
+    if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= 0xFFFFFFFF:
+        raise ProtocolError(f"Invalid {field}: {value!r}")
+
+def _check_json(message):
+    # Frame JSON không đi qua layout nhị phân nên phải tự kiểm tra các trường mà server dùng tới,
+    # nếu không một input sai sẽ làm hỏng tick của cả trận
+    message_type = message['type']
+    if message_type == 'join' and not isinstance(message.get('name', ''), str):
+        raise ProtocolError(f"Invalid name: {message['name']!r}")
+    if message_type == 'move':
+        _check_direction(message.get('direction'))
+    if message_type in ('move', 'shoot') and 'seq' in message:
+        _check_u32('seq', message['seq'])
+    elif message_type == 'ack':
+        _check_u32('seq', message.get('seq'))
+    elif message_type == 'inputs':
+        _check_u32('token', message.get('token'))
+        _check_u32('ack', message.get('ack'))
+        inputs = message.get('inputs')
+        if not isinstance(inputs, list):
+            raise ProtocolError(f"Invalid inputs: {inputs!r}")
+        for item in inputs:
+            # Mỗi input như một move/shoot, nhưng seq là bắt buộc (server so seq để bỏ input gửi lặp)
+            if not isinstance(item, dict) or item.get('type') not in ('move', 'shoot'):
+                raise ProtocolError(f"Invalid input: {item!r}")
+            if item['type'] == 'move':
+                _check_direction(item.get('direction'))
+            _check_u32('seq', item.get('seq'))
+
+def encode_message(message, debug=False):
+    encoder = _ENCODERS.get(message['type'])
+    if debug or encoder is None:
+        return _KIND.pack(MSG_JSON) + json.dumps(_json_ready(message), separators=(',', ':')).encode()
+    return encoder(message)
+
+def decode_message(payload):
+    if not payload:
+        raise ProtocolError("Empty payload")
+    kind = payload[0]
+    if kind == MSG_JSON:
+        try:
+            message = json.loads(bytes(payload[1:]).decode())
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ProtocolError(f"Invalid JSON: {e}")
+        if not isinstance(message, dict) or 'type' not in message:
+            raise ProtocolError("JSON message without a type")
+        _check_json(message)
+        return message
+    decoder = _DECODERS.get(kind)
+    if decoder is None:
+        raise ProtocolError(f"Unknown message kind: {kind}")
+    return decoder(_Reader(payload))
+
+def frame(payload):
+    return HEADER.pack(len(payload)) + payload
+
+def frame_parts(parts):
+    # Như frame() cho payload gồm nhiều buffer: chỉ buffer đầu (nhỏ) bị chép để gắn độ dài vào trước
+    return [HEADER.pack(sum(map(len, parts))) + parts[0], *parts[1:]]
+
+def read_frame(stream):
+    header = stream.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    (size,) = HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Frame too large: {size} bytes")
+    payload = stream.read(size)
+    if len(payload) < size:
+        return None
+    return payload
+
+async def read_frame_async(reader):
+    # Như read_frame cho asyncio.StreamReader; hết dữ liệu giữa chừng thì readexactly ném IncompleteReadError
+    header = await reader.readexactly(HEADER.size)
+    (size,) = HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Frame too large: {size} bytes")
+    return await reader.readexactly(size)
+
+def send_message(sock, message, debug=False):
+    sock.sendall(frame(encode_message(message, debug)))
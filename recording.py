@@ -0,0 +1,74 @@
+import gzip
+import json
+import zlib
+
+from protocol import DIRECTION_CODES
+
+# 2: hướng hồi sinh chọn một lần trong các hướng mở (không còn thử lại ngẫu nhiên), và bot AI được ghi như input
+RECORDING_VERSION = 2
+# Ghi checksum trạng thái mỗi chừng này tick để replay biết chính xác tick nào bắt đầu lệch
+CHECKSUM_INTERVAL = 100
+# Mã input trong log: 0-3 là hướng di chuyển (theo DIRECTIONS), 4 là bắn
+SHOOT_CODE = 4
+
+def open_log(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def state_checksum(server):
+    players = sorted((player_id, player.row()) for player_id, player in server.players.items())
+    bullets = sorted(server.bullet_store.to_rows())
+    return zlib.crc32(repr((players, bullets, server.journal.last_id)).encode('utf-8'))
+
+class Recorder:
+    # Mỗi dòng là một bản ghi JSON, theo đúng thứ tự server áp dụng chúng (mọi lời gọi đều đang giữ khóa):
+    #   {...}                      header: seed mê cung, seed RNG, kích thước
+    #   ['j', id, name]            người chơi vào
+    #   ['l', id]                  người chơi rời đi
+    #   ['t', [[id, code], ...]]   một tick có input (kể cả hành động của bot AI)
+    #   ['i', n]                   n tick liên tiếp không có input
+    #   ['c', tick, crc]           checksum trạng thái sau tick đó
+    def __init__(self, path, header):
+        self.file = open_log(path, 'w')
+        self.ticks = 0
+        self.idle = 0
+        self.inputs = []
+        self.write(dict(header, version=RECORDING_VERSION))
+
+    def write(self, record):
+        if self.idle and not isinstance(record, dict):
+            self.file.write(json.dumps(['i', self.idle], separators=(',', ':')) + '\n')
+            self.idle = 0
+        self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def join(self, client_id, name):
+        self.write(['j', client_id, name])
+
+    def leave(self, client_id):
+        self.write(['l', client_id])
+
+    def input(self, client_id, message):
+        if message['type'] == 'shoot':
+            self.inputs.append([client_id, SHOOT_CODE])
+        elif message['type'] == 'move' and message['direction'] in DIRECTION_CODES:
+            self.inputs.append([client_id, DIRECTION_CODES[message['direction']]])
+
+    def action(self, player_id, code):
+        self.inputs.append([player_id, code])
+
+    def end_tick(self, server):
+        self.ticks += 1
+        if self.inputs:
+            self.write(['t', self.inputs])
+            self.inputs = []
+        else:
+            self.idle += 1
+        if self.ticks % CHECKSUM_INTERVAL == 0:
+            self.write(['c', self.ticks, state_checksum(server)])
+            self.file.flush()
+
+    def close(self, server):
+        # Checksum cuối để replay kiểm tra được cả những tick sau lần ghi checksum gần nhất
+        self.write(['c', self.ticks, state_checksum(server)])
+        self.file.close()
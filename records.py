@@ -0,0 +1,29 @@
+# Bản ghi gọn cho người chơi và đạn phía server. Hướng là mã số (chỉ số trong protocol.DIRECTIONS);
+# row() trả đúng thứ tự trường của struct trên đường truyền để protocol pack thẳng.
+
+class Player:
+    __slots__ = ('x', 'y', 'direction', 'score', 'name')
+
+    def __init__(self, x, y, direction, name, score=0):
+        self.x = x
+        self.y = y
+        self.direction = direction
+        self.score = score
+        self.name = name
+
+    def row(self):
+        return (self.x, self.y, self.direction, self.score, self.name)
+
+class Bullet:
+    __slots__ = ('id', 'x', 'y', 'direction', 'owner', 'distance')
+
+    def __init__(self, bullet_id, x, y, direction, owner):
+        self.id = bullet_id
+        self.x = x
+        self.y = y
+        self.direction = direction
+        self.owner = owner
+        self.distance = 0
+
+    def row(self):
+        return (self.id, self.x, self.y, self.direction, self.owner, self.distance)
@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import threading
+
+from collections import deque
+
+from outbound import AsyncClientWriter
+from protocol import (HEADER, ProtocolError, build_maze, decode_message, encode_message, encode_update_body, frame,
+                      frame_parts, read_frame_async, update_parts)
+from snapshot import SnapshotHistory, build_delta
+from stats import ServerStats, serve_stats
+
+# Số snapshot gần nhất relay giữ làm baseline cho delta gửi viewer
+RELAY_HISTORY = 32
+RELAY_EVENTS = 256
+# Mất kết nối tới server thì chờ chừng này giây rồi kết nối lại
+RECONNECT_DELAY = 1.0
+
+class Viewer:
+    def __init__(self, writer, cursor, init_frame, init_seq):
+        self.writer = writer
+        self.ack = 0
+        self.cursor = cursor
+        # Frame init được gửi kèm mọi update cho tới khi viewer ack một update sau nó, vì writer
+        # chỉ giữ frame mới nhất và có thể bỏ frame mang init
+        self.init_frame = init_frame
+        self.init_seq = init_seq
+
+class SpectatorRelay:
+    # Đăng ký với một GameServer một lần như người xem ('watch'), dựng lại toàn bộ trận rồi phát lại
+    # cho nhiều viewer chỉ đọc (client.py, hoặc relay khác). Với server, cả khán giả chỉ là một kết nối
+    # và một thân update mỗi tick. Relay có seq và id sự kiện riêng, liên tục qua các lần kết nối lại
+    # server, và mã hóa mỗi frame update một lần cho mọi viewer cùng baseline.
+    def __init__(self, server_host='127.0.0.1', server_port=5555, host='127.0.0.1', port=5600, debug=False,
+                 stats_port=None):
+        self.server_host = server_host
+        self.server_port = server_port
+        self.host = host
+        self.port = port
+        self.debug = debug
+        self.stats_port = stats_port
+        self.loop = None
+        self.stats = ServerStats()
+
+        self.history = SnapshotHistory()
+        self.seq = 0
+        self.snapshots = {}
+        self.snapshot_order = deque()
+        self.events = deque(maxlen=RELAY_EVENTS)
+        self.event_id = 0
+        self.init_frame = None
+        self.minimap_frame = None
+        self.viewers = {}
+        self.next_viewer_id = 0
+
+    def handle_init(self, message):
+        # Trận mới (lần đầu, kết nối lại hoặc server chuyển relay sang phòng khác): mọi viewer nhận
+        # init mới rồi một keyframe. Init không kèm người chơi/đạn, keyframe ngay sau đó mang đủ.
+        self.history.reset(message['history'])
+        self.snapshots.clear()
+        self.snapshot_order.clear()
+        self.minimap_frame = None
+        # Viewer là client cần vẽ mê cung (hoặc relay khác), nên gửi bit-packed chứ không chỉ seed
+        init = {'type': 'init', 'id': 0, 'maze': build_maze(message), 'maze_seed': None, 'history': RELAY_HISTORY,
+                'players': {}, 'bullets': []}
+        self.init_frame = frame(encode_message(init, self.debug))
+        for viewer in self.viewers.values():
+            viewer.ack = 0
+            viewer.init_frame = self.init_frame
+            viewer.init_seq = self.seq + 1
+        maze = message['maze']
+        print(f"Watching a {len(maze[0])}x{len(maze)} match")
+
+    def handle_update(self, message):
+        # Trả về True nếu update áp được (cần ack lên server)
+        last_event_id = self.history.last_event_id
+        state = self.history.apply(message)
+        if state is None:
+            return False
+        players, bullets, events = state
+        for event in events:
+            if event['id'] > last_event_id:
+                self.event_id += 1
+                self.events.append(dict(event, id=self.event_id))
+        self.seq += 1
+        self.snapshots[self.seq] = (players, bullets, self.event_id)
+        self.snapshot_order.append(self.seq)
+        while len(self.snapshot_order) > RELAY_HISTORY:
+            del self.snapshots[self.snapshot_order.popleft()]
+        self.fan_out()
+        return True
+
+    def build_update(self, baseline, cursor):
+        players, bullets, event_id = self.snapshots[self.seq]
+        base_players, base_bullets = self.snapshots[baseline][:2] if baseline else ({}, {})
+        events = [event for event in self.events if cursor < event['id'] <= event_id]
+        message = build_delta(self.seq, baseline, players, bullets, base_players, base_bullets, events)
+        message['input_ack'] = 0
+        return message
+
+    def fan_out(self):
+        # Viewer không có input nên input_ack luôn 0: cả frame (không chỉ phần thân) dùng chung
+        # cho mọi viewer cùng baseline và cursor
+        frames = {}
+        minimap_frame, self.minimap_frame = self.minimap_frame, None
+        for viewer in self.viewers.values():
+            baseline = viewer.ack if viewer.ack in self.snapshots else 0
+            cursor = self.snapshots[baseline][2] if baseline else viewer.cursor
+            key = (baseline, cursor)
+            buffers = frames.get(key)
+            if buffers is None:
+                message = self.build_update(baseline, cursor)
+                if self.debug:
+                    buffers = [frame(encode_message(message, True))]
+                else:
+                    buffers = frame_parts(update_parts(message, encode_update_body(message)))
+                if minimap_frame is not None:
+                    buffers.append(minimap_frame)
+                frames[key] = buffers
+            if viewer.init_frame is not None:
+                buffers = [viewer.init_frame, *buffers]
+            viewer.writer.push(buffers)
+
+    async def watch_server(self):
+        host, port = self.server_host, self.server_port
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+            except OSError as e:
+                print(f"Cannot reach the server at {host}:{port}: {e}")
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            try:
+                writer.write(frame(encode_message({'type': 'watch'}, self.debug)))
+                while True:
+                    message = decode_message(await read_frame_async(reader))
+                    if message['type'] == 'redirect':
+                        host, port = message['host'], message['port']
+                        break
+                    if message['type'] == 'init':
+                        self.handle_init(message)
+                    elif message['type'] == 'minimap':
+                        self.minimap_frame = frame(encode_message(message, self.debug))
+                    elif message['type'] == 'update' and self.handle_update(message):
+                        writer.write(frame(encode_message({'type': 'ack', 'seq': message['seq']}, self.debug)))
+            except (asyncio.IncompleteReadError, ProtocolError, OSError) as e:
+                print(f"Lost the server at {host}:{port}: {e!r}")
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                writer.close()
+
+    async def handle_viewer(self, reader, writer):
+        self.next_viewer_id += 1
+        viewer_id = self.next_viewer_id
+        try:
+            # Frame đầu là join (client.py) hoặc watch (relay khác); tên người chơi bị bỏ qua
+            await read_frame_async(reader)
+            self.stats.add_client(viewer_id)
+            client_writer = AsyncClientWriter(viewer_id, writer, self.stats)
+            viewer = self.viewers[viewer_id] = Viewer(client_writer, self.event_id, self.init_frame, self.seq + 1)
+            print(f"Viewer {viewer_id} connected ({len(self.viewers)} watching)")
+            while True:
+                payload = await read_frame_async(reader)
+                self.stats.count_in(viewer_id, HEADER.size + len(payload))
+                message = decode_message(payload)
+                # Input của viewer bị bỏ qua, chỉ ack có nghĩa
+                if message['type'] == 'ack' and message['seq'] > viewer.ack:
+                    viewer.ack = message['seq']
+                    if viewer.init_frame is not None and viewer.ack >= viewer.init_seq:
+                        viewer.init_frame = None
+        except (asyncio.IncompleteReadError, ProtocolError, ConnectionError):
+            pass
+        finally:
+            viewer = self.viewers.pop(viewer_id, None)
+            if viewer is not None:
+                viewer.writer.close()
+                print(f"Viewer {viewer_id} disconnected ({len(self.viewers)} watching)")
+            self.stats.remove_client(viewer_id)
+            writer.close()
+
+    async def collect_stats(self):
+        players, bullets, _ = self.snapshots.get(self.seq, ({}, {}, 0))
+        return self.stats.report(len(players), len(bullets))
+
+    def stats_report(self):
+        # Được gọi từ thread phục vụ stats: lấy số liệu trên event loop
+        return asyncio.run_coroutine_threadsafe(self.collect_stats(), self.loop).result(timeout=5)
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self.handle_viewer, self.host, self.port, backlog=1024)
+        print(f"Relay for {self.server_host}:{self.server_port} started on {self.host}:{self.port}")
+        if self.stats_port is not None:
+            threading.Thread(target=serve_stats, args=(self.stats_report, self.host, self.stats_port),
+                             daemon=True).start()
+        async with server:
+            watch_task = asyncio.create_task(self.watch_server())
+            try:
+                await server.serve_forever()
+            finally:
+                watch_task.cancel()
+
+    def start(self):
+        asyncio.run(self.serve())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Zace Game spectator relay")
+    parser.add_argument('--server-host', default='127.0.0.1', help='Game server (or room, or another relay) to watch')
+    parser.add_argument('--server-port', type=int, default=5555)
+    parser.add_argument('--host', default='127.0.0.1', help='Address viewers connect to')
+    parser.add_argument('--port', type=int, default=5600, help='Port viewers connect to (client.py --port)')
+    parser.add_argument('--json', action='store_true',
+                        help='Send JSON frames instead of the binary encoding (debugging)')
+    parser.add_argument('--stats-port', type=int, default=None,
+                        help='Serve a JSON stats report (viewers, traffic) to every connection on this port')
+    args = parser.parse_args()
+
+    relay = SpectatorRelay(args.server_host, args.server_port, args.host, args.port, args.json, args.stats_port)
+    try:
+        relay.start()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,83 @@
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+
+from protocol import DIRECTIONS, encode_message
+from recording import RECORDING_VERSION, SHOOT_CODE, open_log, state_checksum
+from server import GameServer
+
+def replay(path, numpy_bullets=False):
+    # Chạy lại log qua đúng các hàm của server, không socket, không sleep.
+    # Trả về (số tick, thời gian, None) hoặc, nếu checksum lệch, (tick, thời gian, tick cuối cùng còn khớp).
+    with open_log(path, 'r') as log:
+        header = json.loads(log.readline())
+        if header.get('version') != RECORDING_VERSION:
+            raise ValueError(f"Unsupported recording version: {header.get('version')}")
+        server = GameServer(maze_width=header['maze_width'], maze_height=header['maze_height'],
+                            maze_seed=header['maze_seed'], seed=header['seed'], numpy_bullets=numpy_bullets,
+                            aoi=False)
+        ticks = 0
+        verified = 0
+        started = time.perf_counter()
+        for line in log:
+            record = json.loads(line)
+            kind = record[0]
+            if kind == 't':
+                for client_id, code in record[1]:
+                    if code == SHOOT_CODE:
+                        server.process_client_message(client_id, {'type': 'shoot'})
+                    else:
+                        server.process_client_message(client_id, {'type': 'move', 'direction': DIRECTIONS[code]})
+                server.update_game_state()
+                ticks += 1
+            elif kind == 'i':
+                for _ in range(record[1]):
+                    server.update_game_state()
+                ticks += record[1]
+            elif kind == 'j':
+                server.add_player(record[1], encode_message({'type': 'join', 'name': record[2]}, True))
+            elif kind == 'l':
+                server.remove_client(record[1])
+            elif kind == 'c':
+                if record[1] != ticks:
+                    raise ValueError(f"Checksum for tick {record[1]} found after tick {ticks}")
+                if state_checksum(server) != record[2]:
+                    return ticks, time.perf_counter() - started, verified
+                verified = ticks
+        return ticks, time.perf_counter() - started, None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded Zace match at full speed")
+    parser.add_argument('recording', help='Log written by server.py --record')
+    parser.add_argument('--numpy-bullets', action='store_true',
+                        help='Replay with the NumPy bullet store (the result must not change)')
+    parser.add_argument('--profile', action='store_true', help='Run under cProfile and print the hottest functions')
+    parser.add_argument('--top', type=int, default=25, help='Number of functions to print with --profile')
+    parser.add_argument('--verbose', action='store_true', help='Keep the server join/leave messages')
+    args = parser.parse_args()
+
+    stdout = sys.stdout
+    if not args.verbose:
+        sys.stdout = open(os.devnull, 'w')
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+    ticks, elapsed, last_match = replay(args.recording, args.numpy_bullets)
+    if profiler is not None:
+        profiler.disable()
+    sys.stdout = stdout
+
+    print(f"Replayed {ticks} ticks in {elapsed:.3f}s ({ticks / elapsed if elapsed else 0:.0f} ticks/s)")
+    if profiler is not None:
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(args.top)
+        print(report.getvalue())
+    if last_match is not None:
+        print(f"State diverged from the recording between tick {last_match} and tick {ticks}")
+        sys.exit(1)
+    print("State matches the recording")
@@ -0,0 +1,69 @@
+import argparse
+import math
+
+# Số tick mô phỏng tối đa chạy bù trong một lần; trễ hơn nữa thì bỏ hẳn các tick đó
+# (game chạy chậm lại) thay vì đuổi theo mãi
+MAX_CATCH_UP = 5
+# Khi quá tải chỉ giảm tần số broadcast tới mức này (lần/giây), sau đó mới bỏ tick mô phỏng
+MIN_BROADCAST_RATE = 2.0
+# Đúng giờ liên tục chừng này giây thì tăng lại tần số broadcast một bậc
+RECOVER_SECONDS = 2.0
+
+def tick_rate_arg(value):
+    # Kiểu argparse cho --tick-rate của mọi công cụ: 0, số âm hay vô cực không cho ra chu kỳ tick hợp lệ
+    try:
+        rate = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid tick rate: {value!r}")
+    if not (math.isfinite(rate) and rate > 0):
+        raise argparse.ArgumentTypeError(f"tick rate must be a positive number, got {value}")
+    return rate
+
+class TickScheduler:
+    # Bước thời gian cố định: tick thứ n chạy ở start + n * interval, không phụ thuộc tick trước
+    # tốn bao lâu, nên chu kỳ không bị trôi. Trễ thì chạy bù các tick mô phỏng bị lỡ và chỉ
+    # broadcast một lần sau cùng; trễ liên tục thì broadcast thưa dần (mỗi `divisor` tick một lần).
+    def __init__(self, tick_rate, stats):
+        self.interval = 1.0 / tick_rate
+        self.stats = stats
+        self.max_divisor = max(1, int(tick_rate / MIN_BROADCAST_RATE))
+        self.recover_ticks = max(1, int(RECOVER_SECONDS * tick_rate))
+        self.divisor = 1
+        self.on_time = 0
+        self.tick = 0
+        self.next_tick = None
+
+    def poll(self, now):
+        # Trả về (số tick mô phỏng cần chạy ngay, có broadcast sau tick cuối hay không)
+        if self.next_tick is None:
+            self.next_tick = now
+        if now < self.next_tick:
+            return 0, False
+        steps = int((now - self.next_tick) / self.interval) + 1
+        if steps > MAX_CATCH_UP:
+            skipped = steps - MAX_CATCH_UP
+            self.stats.skipped_ticks += skipped
+            self.next_tick += skipped * self.interval
+            steps = MAX_CATCH_UP
+        if steps > 1:
+            # Lỡ ít nhất một tick: giảm tần số broadcast trước khi phải bỏ tick mô phỏng
+            self.stats.overruns += 1
+            self.stats.catch_up_ticks += steps - 1
+            self.on_time = 0
+            if self.divisor < self.max_divisor:
+                self.divisor += 1
+        else:
+            self.on_time += 1
+            if self.divisor > 1 and self.on_time >= self.recover_ticks:
+                self.divisor -= 1
+                self.on_time = 0
+        self.stats.broadcast_divisor = self.divisor
+        self.next_tick += steps * self.interval
+        first = self.tick
+        self.tick += steps
+        # Broadcast nếu một trong các tick vừa chạy rơi vào lịch broadcast
+        broadcast = self.tick // self.divisor > first // self.divisor
+        return steps, broadcast
+
+    def delay(self, now):
+        return max(0.0, self.next_tick - now)
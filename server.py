@@ -1,288 +1,555 @@
+import secrets
 import socket
 import threading
-import random
-import json
 import time
+import argparse
 
-class GameServer:
-    def __init__(self, host='127.0.0.1', port=5555):
+from collections import deque
+
+from ai import BotController
+from engine import TICK_RATE, GameEngine
+from interest import InterestGrid
+from outbound import STALE_SECONDS, ClientWriter, DatagramWriter
+from recording import Recorder
+from scheduler import TickScheduler, tick_rate_arg
+from snapshot import build_delta
+from protocol import (DIRECTION_CODES, HEADER, MAX_DATAGRAM_SIZE, ProtocolError, decode_message, encode_message,
+                      encode_update_body, frame, frame_parts, read_frame, update_parts)
+from stats import ServerStats, TimedLock, dump_stats, serve_stats
+
+# Số snapshot gần nhất được giữ lại để làm baseline cho delta (ít nhất, và ít nhất ~2 giây)
+MIN_SNAPSHOT_HISTORY = 32
+SNAPSHOT_HISTORY_SECONDS = 2.0
+# Giới hạn input mỗi client: token bucket (số input/giây, số input dồn tối đa)
+INPUT_RATE = 20
+INPUT_BURST = 10
+INPUT_QUEUE_SIZE = 32
+# Gửi minimap (số người chơi mỗi sector) khoảng mỗi chừng này giây
+MINIMAP_PERIOD = 2.0
+# Độ dài tên tối đa (ký tự), bằng giới hạn ô nhập tên của client
+MAX_NAME_LENGTH = 15
+
+class GameServer(GameEngine):
+    def __init__(self, host='127.0.0.1', port=5555, debug=False, numpy_bullets=False,
+                 stats_port=None, stats_file=None, maze_width=32, maze_height=16, maze_seed=None,
+                 aoi=True, minimap=False, seed=None, record=None, udp=False,
+                 bots=0, tick_rate=TICK_RATE):
         self.host = host
         self.port = port
+        self.debug = debug
+        self.stats_port = stats_port
+        self.stats_file = stats_file
+        self.server_socket = None
+        self.udp = udp
+        self.udp_socket = None
+        GameEngine.__init__(self, maze_width, maze_height, maze_seed, seed, numpy_bullets)
+        
+        self.clients = {}
+        # Client chỉ xem (vd. relay.py): không có người chơi, nhận toàn bộ trận, không gửi input
+        self.spectators = set()
+        self.interest = InterestGrid(len(self.maze[0]), len(self.maze)) if aoi else None
+        self.minimap = minimap and aoi
+        self.tick_rate = tick_rate
+        self.stats = ServerStats(tick_rate)
+        self.lock = TimedLock(self.stats)
+        # Các giới hạn tính theo số tick/snapshot được quy ra từ thời gian thực theo tick_rate
+        self.snapshot_history = max(MIN_SNAPSHOT_HISTORY, round(SNAPSHOT_HISTORY_SECONDS * tick_rate))
+        self.minimap_interval = max(1, round(MINIMAP_PERIOD * tick_rate))
+        self.max_stale_frames = max(1, round(STALE_SECONDS * tick_rate))
+        # Id sự kiện cuối cùng mỗi client chắc chắn đã nhận (theo snapshot đã ack)
+        self.event_cursors = {}
+        self.snapshot_seq = 0
+        self.snapshots = {}
+        self.snapshot_order = deque()
+        self.client_acks = {}
+        self.input_queues = {}
+        self.input_buckets = {}
+        self.input_acks = {}
+        # Chế độ UDP: token -> client, và writer UDP của từng client (chỉ dùng khi đã biết địa chỉ)
+        self.udp_tokens = {}
+        self.udp_writers = {}
+        self.udp_input_seqs = {}
+        self.bots = BotController(self, bots, tick_rate) if bots > 0 else None
+        self.recorder = None
+        if record is not None:
+            self.recorder = Recorder(record, {'maze_width': maze_width, 'maze_height': maze_height,
+                                              'maze_seed': self.maze_seed, 'seed': self.seed,
+                                              'tick_rate': tick_rate})
+            print(f"Recording inputs to {record}")
+    
+    def open_listener(self):
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server_socket.bind((self.host, self.port))
         self.server_socket.listen(5)
-        
-        self.clients = {}
-        self.players = {}
-        self.bullets = []
-        self.maze = self.generate_maze(32, 16)
-        self.lock = threading.Lock()
-        self.status_messages = []
-        
-        print(f"Server started on {self.host}:{self.port}")
+        if self.udp:
+            # Cùng số cổng với TCP; join và init vẫn đi qua TCP
+            self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.udp_socket.bind((self.host, self.port))
+        print(f"Server started on {self.host}:{self.port}{' (tcp+udp)' if self.udp else ''} "
+              f"({len(self.maze[0])}x{len(self.maze)} maze, seed {self.maze_seed}, game seed {self.seed}, "
+              f"{self.tick_rate:g} ticks/s)")
     
-    def generate_maze(self, width, height):
-        if width % 2 == 0:
-            width += 1
-        if height % 2 == 0:
-            height += 1
-        
-        maze = [[1 for _ in range(width)] for _ in range(height)]
-        
-        directions = [(0, -2), (2, 0), (0, 2), (-2, 0)]
-        
-        start_x = random.randrange(1, width, 2)
-        start_y = random.randrange(1, height, 2)
-        maze[start_y][start_x] = 0
-        
-        stack = [(start_x, start_y)]
-        visited = set([(start_x, start_y)])
-        
-        while stack:
-            x, y = stack[-1]
-            random.shuffle(directions)
-            moved = False
-            for dx, dy in directions:
-                nx, ny = x + dx, y + dy
-                if (0 < nx < width-1 and 0 < ny < height-1 and 
-                    (nx, ny) not in visited):
-                    maze[y + dy//2][x + dx//2] = 0 
-                    maze[ny][nx] = 0
-                    stack.append((nx, ny))
-                    visited.add((nx, ny))
-                    moved = True
-                    break
-            if not moved:
-                stack.pop()
+    def close_recorder(self):
+        with self.lock:
+            if self.recorder is not None:
+                self.recorder.close(self)
+                self.recorder = None
+    
+    def add_player(self, client_id, join_payload):
+        # Nhận tên người chơi từ client
+        join = decode_message(join_payload)
+        if join['type'] == 'watch':
+            return self.add_spectator(client_id)
+        player_name = join.get('name', '').strip()[:MAX_NAME_LENGTH] if join['type'] == 'join' else ''
         
-        for _ in range(width * height // 20):
-            x = random.randrange(1, width-1, 2)
-            y = random.randrange(1, height-1, 2)
-            dx, dy = random.choice([(0, 1), (1, 0), (0, -1), (-1, 0)])
-            nx, ny = x + dx, y + dy
-            if 0 < nx < width-1 and 0 < ny < height-1 and maze[ny][nx] == 1:
-                maze[ny][nx] = 0
+        # Nếu không có tên hoặc tên không hợp lệ, đặt tên mặc định
+        if not player_name:
+            player_name = f"Player{client_id}"
         
-        for _ in range(4):
-            side = random.randint(0, 3)
-            if side == 0:
-                x = random.randrange(1, width-1, 2)
-                y = 0
-                maze[y+1][x] = 0
-            elif side == 1:
-                x = width - 1
-                y = random.randrange(1, height-1, 2)
-                maze[y][x-1] = 0
-            elif side == 2:
-                x = random.randrange(1, width-1, 2)
-                y = height - 1
-                maze[y-1][x] = 0
-            elif side == 3:
-                x = 0
-                y = random.randrange(1, height-1, 2)
-                maze[y][x+1] = 0
+        print(f"Client {client_id} connected as '{player_name}'")
         
-        return maze
-    
-    def get_random_empty_position(self):
-        while True:
-            x = random.randint(1, len(self.maze[0]) - 2)
-            y = random.randint(1, len(self.maze) - 2)
-            if self.maze[y][x] == 0 and not any(p['x'] == x and p['y'] == y for p in self.players.values()):
-                return x, y
-
-    def handle_client(self, client_socket, client_id):
-        try:
-            # Nhận tên người chơi từ client
-            name_data = client_socket.recv(1024).decode()
-            player_name = name_data.strip()
-            
-            # Nếu không có tên hoặc tên không hợp lệ, đặt tên mặc định
-            if not player_name or player_name.startswith("{"):
-                player_name = f"Player{client_id}"
-            
-            print(f"Client {client_id} connected as '{player_name}'")
-            
-            x, y = self.get_random_empty_position()
-            with self.lock:
-                self.clients[client_id] = client_socket
-                self.players[client_id] = {
-                    'x': x,
-                    'y': y,
-                    'direction': random.choice(['up', 'down', 'left', 'right']),
-                    'score': 0,
-                    'name': player_name
-                }
-                self.status_messages.append(f"{player_name} started!")
+        with self.lock:
+            # Client mới vẫn thấy sự kiện join của chính mình
+            self.event_cursors[client_id] = self.journal.last_id
+            player = self.spawn_player(client_id, player_name)
+            # Hàng đợi input có ngay từ lúc này (trước register_client), vì gói UDP đầu tiên mang token
+            # có thể tới ngay sau init
+            self.input_queues[client_id] = deque(maxlen=INPUT_QUEUE_SIZE)
+            self.input_buckets[client_id] = [INPUT_BURST, time.monotonic()]
+            if self.recorder is not None:
+                self.recorder.join(client_id, player_name)
             
+            players = {player_id: player.row() for player_id, player in self.players.items()}
+            bullets = self.bullet_store.to_rows()
+            if self.interest is not None:
+                window = self.interest.window(player.x, player.y)
+                players = {player_id: row for player_id, row in players.items()
+                           if self.interest.contains(window, row[0], row[1])}
+                bullets = [row for row in bullets if self.interest.contains(window, row[1], row[2])]
             initial_state = {
                 'type': 'init',
                 'id': client_id,
                 'maze': self.maze,
-                'players': self.players,
-                'bullets': self.bullets
+                # Mê cung lớn chỉ gửi seed, trừ khi client xin cả mê cung (dựng lại từ seed mất vài giây)
+                'maze_seed': None if join.get('full_maze') else self.maze_seed,
+                # Client giữ ít nhất chừng này snapshot làm baseline, bằng số snapshot server giữ
+                'history': self.snapshot_history,
+                'players': players,
+                'bullets': bullets
             }
-            client_socket.send(json.dumps(initial_state).encode())
-            
-            while True:
+            init_frame = frame(encode_message(initial_state, self.debug))
+            if self.udp:
+                # Client muốn dùng UDP thì gửi gói đầu tiên kèm token này từ địa chỉ UDP của nó
+                token = secrets.randbits(32)
+                while token in self.udp_tokens:
+                    token = secrets.randbits(32)
+                self.udp_tokens[token] = client_id
+                self.udp_writers[client_id] = DatagramWriter(client_id, token, self.send_datagram, self.stats)
+                offer = {'type': 'udp', 'token': token, 'port': self.port}
+                init_frame += frame(encode_message(offer, self.debug))
+            return init_frame
+    
+    def add_spectator(self, client_id):
+        print(f"Client {client_id} connected as a spectator")
+        with self.lock:
+            self.spectators.add(client_id)
+            self.event_cursors[client_id] = self.journal.last_id
+            initial_state = {
+                'type': 'init',
+                'id': 0,
+                # Người xem (relay) chuyển mê cung tiếp cho client vẽ, nên luôn nhận bản bit-packed
+                'maze': self.maze,
+                'maze_seed': None,
+                'history': self.snapshot_history,
+                'players': {player_id: player.row() for player_id, player in self.players.items()},
+                'bullets': self.bullet_store.to_rows()
+            }
+            return frame(encode_message(initial_state, self.debug))
+    
+    def open_writer(self, client_id, connection):
+        return ClientWriter(client_id, connection, self.stats, self.max_stale_frames)
+    
+    def register_client(self, client_id, connection):
+        writer = self.open_writer(client_id, connection)
+        with self.lock:
+            # Mọi frame gửi đi sau init đều qua writer riêng của client, không gửi trực tiếp khi đang giữ khóa
+            self.clients[client_id] = writer
+            self.stats.add_client(client_id)
+    
+    def remove_client(self, client_id):
+        with self.lock:
+            writer = self.clients.pop(client_id, None)
+            self.spectators.discard(client_id)
+            if self.remove_player(client_id) is not None:
+                if self.recorder is not None:
+                    self.recorder.leave(client_id)
+            self.event_cursors.pop(client_id, None)
+            self.client_acks.pop(client_id, None)
+            self.input_queues.pop(client_id, None)
+            self.input_buckets.pop(client_id, None)
+            self.input_acks.pop(client_id, None)
+            udp_writer = self.udp_writers.pop(client_id, None)
+            if udp_writer is not None:
+                self.udp_tokens.pop(udp_writer.token, None)
+                self.udp_input_seqs.pop(client_id, None)
+            self.stats.remove_client(client_id)
+        if writer is not None:
+            writer.close()
+        print(f"Client {client_id} disconnected")
+    
+    def redirect_clients(self, count, host, port):
+        if count <= 0:
+            return
+        redirect_frame = frame(encode_message({'type': 'redirect', 'host': host, 'port': port}, self.debug))
+        with self.lock:
+            # Ngừng gửi update cho client bị chuyển; người chơi bị xóa khi client tự đóng kết nối.
+            # Người xem không tính vào tải của phòng nên không bị chuyển.
+            movable = [client_id for client_id in self.clients if client_id not in self.spectators]
+            writers = [self.clients.pop(client_id) for client_id in movable[-count:]]
+        for writer in writers:
+            writer.finish(redirect_frame)
+    
+    def allow_input(self, client_id):
+        bucket = self.input_buckets[client_id]
+        now = time.monotonic()
+        bucket[0] = min(INPUT_BURST, bucket[0] + (now - bucket[1]) * INPUT_RATE)
+        bucket[1] = now
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+    
+    def handle_payload(self, client_id, payload):
+        self.stats.count_in(client_id, HEADER.size + len(payload))
+        try:
+            message = decode_message(payload)
+        except ProtocolError as e:
+            print(f"Invalid message from client {client_id}: {e}")
+            return
+        with self.lock:
+            if message['type'] == 'ack':
+                self.apply_client_message(client_id, message)
+            elif message['type'] in ('move', 'shoot') and client_id in self.input_queues:
+                self.queue_input(client_id, message)
+    
+    def queue_input(self, client_id, message):
+        # Input được xử lý ở tick kế tiếp trong update_game_state. Input vượt giới hạn
+        # vẫn chiếm chỗ trong hàng đợi (dạng 'skip') để input_ack giữ đúng thứ tự.
+        if not self.allow_input(client_id):
+            message = {'type': 'skip', 'seq': message.get('seq', 0)}
+        self.input_queues[client_id].append(message)
+    
+    def handle_datagram(self, data, address):
+        try:
+            message = decode_message(data)
+        except ProtocolError:
+            return
+        if message['type'] != 'inputs':
+            return
+        with self.lock:
+            client_id = self.udp_tokens.get(message['token'])
+            if client_id is None or client_id not in self.input_queues:
+                return
+            self.stats.count_in(client_id, len(data))
+            # Địa chỉ mới nhất thắng, để client đổi cổng (NAT) vẫn tiếp tục nhận được update
+            self.udp_writers[client_id].address = address
+            if message['ack']:
+                self.apply_client_message(client_id, {'type': 'ack', 'seq': message['ack']})
+            # Mỗi gói gửi lại vài input gần nhất: chỉ nhận những input có seq mới hơn input đã nhận
+            last_seq = self.udp_input_seqs.get(client_id, 0)
+            for item in message['inputs']:
+                if item['seq'] > last_seq:
+                    self.queue_input(client_id, item)
+                    last_seq = item['seq']
+            self.udp_input_seqs[client_id] = last_seq
+    
+    def send_datagram(self, buffers, address):
+        # sendmsg ghép các buffer thành một gói mà không phải nối trước
+        if hasattr(self.udp_socket, 'sendmsg'):
+            self.udp_socket.sendmsg(buffers, (), 0, address)
+        else:
+            self.udp_socket.sendto(b''.join(buffers), address)
+    
+    def udp_loop(self):
+        while True:
+            try:
+                data, address = self.udp_socket.recvfrom(65535)
+            except OSError as e:
+                print(f"UDP receive error: {e}")
+                continue
+            try:
+                self.handle_datagram(data, address)
+            except Exception as e:
+                # Gói UDP không cần xác thực mới tới được đây: một gói hỏng không được làm dừng thread nhận
+                print(f"Invalid datagram from {address}: {e!r}")
+    
+    def drain_inputs(self):
+        for client_id, queue in self.input_queues.items():
+            while queue:
+                message = queue.popleft()
                 try:
-                    data = client_socket.recv(1024).decode()
-                    if not data:
-                        break
-                    
-                    message = json.loads(data)
-                    self.process_client_message(client_id, message)
-                    self.broadcast_game_state()
-                except json.JSONDecodeError:
-                    print(f"Invalid JSON from client {client_id}")
+                    self.apply_client_message(client_id, message)
+                except (KeyError, TypeError, ValueError) as e:
+                    # Một input hỏng chỉ bị bỏ qua, không được làm dừng vòng lặp game của mọi người
+                    print(f"Dropping invalid input from client {client_id}: {e!r}")
                     continue
+                self.input_acks[client_id] = message.get('seq', 0)
+                if self.recorder is not None:
+                    self.recorder.input(client_id, message)
+    
+    def handle_client(self, client_socket, client_id):
+        try:
+            stream = client_socket.makefile('rb')
+            payload = read_frame(stream)
+            if payload is None:
+                return
+            client_socket.sendall(self.add_player(client_id, payload))
+            self.register_client(client_id, client_socket)
+            
+            while True:
+                payload = read_frame(stream)
+                if payload is None:
+                    break
+                self.handle_payload(client_id, payload)
                 
         except Exception as e:
             print(f"Error processing client {client_id}: {e}")
         finally:
-            with self.lock:
-                if client_id in self.clients:
-                    del self.clients[client_id]
-                if client_id in self.players:
-                    del self.players[client_id]
+            self.remove_client(client_id)
             client_socket.close()
-            print(f"Client {client_id} disconnected")
-            self.broadcast_game_state()
     
     def process_client_message(self, client_id, message):
         with self.lock:
-            if message['type'] == 'move':
-                direction = message['direction']
-                player = self.players[client_id]
-                new_x, new_y = player['x'], player['y']
-                if direction == 'up':
-                    player['direction'] = 'up'
-                    new_y -= 1
-                elif direction == 'down':
-                    player['direction'] = 'down'
-                    new_y += 1
-                elif direction == 'left':
-                    player['direction'] = 'left'
-                    new_x -= 1
-                elif direction == 'right':
-                    player['direction'] = 'right'
-                    new_x += 1
-                
-                if (0 <= new_y < len(self.maze) and 
-                    0 <= new_x < len(self.maze[0]) and 
-                    self.maze[new_y][new_x] == 0 and 
-                    not any(p['x'] == new_x and p['y'] == new_y for p in self.players.values())):
-                    player['x'] = new_x
-                    player['y'] = new_y
-            
-            elif message['type'] == 'shoot':
-                player = self.players[client_id]
-                bullet = {
-                    'x': player['x'],
-                    'y': player['y'],
-                    'direction': player['direction'],
-                    'owner': client_id,
-                    'distance': 0
-                }
-                can_shoot = True
-                for b in self.bullets:
-                    if b['owner'] == client_id and b['distance'] < 4:
-                        can_shoot = False
-                        break
-                if can_shoot:
-                    self.bullets.append(bullet)
-                    player['score'] -= 1
+            self.apply_client_message(client_id, message)
+    
+    def apply_client_message(self, client_id, message):
+        if message['type'] == 'move':
+            direction = DIRECTION_CODES.get(message['direction'])
+            if direction is not None:
+                self.move(client_id, direction)
+        
+        elif message['type'] == 'shoot':
+            self.shoot(client_id)
+        
+        elif message['type'] == 'ack':
+            if message['seq'] > self.client_acks.get(client_id, 0):
+                self.client_acks[client_id] = message['seq']
+                snapshot = self.snapshots.get(message['seq'])
+                if snapshot is not None:
+                    self.event_cursors[client_id] = snapshot['event_id']
     
     def update_game_state(self):
         with self.lock:
-            new_bullets = []
-            for bullet in self.bullets:
-                if bullet['direction'] == 'up':
-                    bullet['y'] -= 1
-                elif bullet['direction'] == 'down':
-                    bullet['y'] += 1
-                elif bullet['direction'] == 'left':
-                    bullet['x'] -= 1
-                elif bullet['direction'] == 'right':
-                    bullet['x'] += 1
-                
-                bullet['distance'] += 1
-                
-                if (bullet['y'] < 0 or bullet['y'] >= len(self.maze) or
-                    bullet['x'] < 0 or bullet['x'] >= len(self.maze[0]) or
-                    self.maze[bullet['y']][bullet['x']] == 1):
-                    continue
-                
-                hit_player = None
-                for player_id, player in self.players.items():
-                    if player_id != bullet['owner'] and player['x'] == bullet['x'] and player['y'] == bullet['y']:
-                        hit_player = player_id
-                        break
-                
-                if hit_player:
-                    self.players[bullet['owner']]['score'] += 11
-                    self.players[hit_player]['score'] -= 5
-                    
-                    x, y = self.get_random_empty_position()
-                    self.players[hit_player]['x'] = x
-                    self.players[hit_player]['y'] = y
-                    self.players[hit_player]['direction'] = random.choice(['up', 'down', 'left', 'right'])
-                    
-                    shooter_name = self.players[bullet['owner']]['name']
-                    hit_player_name = self.players[hit_player]['name']
-                    self.status_messages.append(f"{shooter_name} just vaporized {hit_player_name}")
-                    
-                    while True:
-                        direction = self.players[hit_player]['direction']
-                        check_x, check_y = x, y
-                        if direction == 'up':
-                            check_y -= 1
-                        elif direction == 'down':
-                            check_y += 1
-                        elif direction == 'left':
-                            check_x -= 1
-                        elif direction == 'right':
-                            check_x += 1
-                        if (0 <= check_y < len(self.maze) and 
-                            0 <= check_x < len(self.maze[0]) and 
-                            self.maze[check_y][check_x] == 0):
-                            break
-                        self.players[hit_player]['direction'] = random.choice(['up', 'down', 'left', 'right'])
-                else:
-                    new_bullets.append(bullet)
-            
-            self.bullets = new_bullets
+            if self.bots is not None:
+                # Bot vào/ra trước khi áp input, cùng thứ tự với các dòng join/leave trong log ghi lại
+                self.balance_bots()
+            self.drain_inputs()
+            if self.bots is not None:
+                self.run_bots()
+            self.step()
+            if self.recorder is not None:
+                self.recorder.end_tick(self)
+    
+    def balance_bots(self):
+        joined, left = self.bots.balance()
+        if self.recorder is not None:
+            for player_id, name in joined:
+                self.recorder.join(player_id, name)
+            for player_id in left:
+                self.recorder.leave(player_id)
+    
+    def run_bots(self):
+        actions = self.bots.step()
+        if self.recorder is not None:
+            for player_id, code in actions:
+                self.recorder.action(player_id, code)
+    
+    def take_snapshot(self):
+        self.snapshot_seq += 1
+        snapshot = self.snapshots[self.snapshot_seq] = {
+            'players': {player_id: player.row() for player_id, player in self.players.items()},
+            'bullets': {row[0]: row for row in self.bullet_store.to_rows()},
+            'event_id': self.journal.last_id,
+            # Window mà mỗi client được gửi ở snapshot này, để delta sau tính trên đúng tập đã gửi
+            'windows': {},
+            'views': {}
+        }
+        if self.interest is not None:
+            snapshot['sectors'] = self.interest.index(snapshot['players'], snapshot['bullets'])
+        self.snapshot_order.append(self.snapshot_seq)
+        while len(self.snapshot_order) > self.snapshot_history:
+            del self.snapshots[self.snapshot_order.popleft()]
+        return self.snapshot_seq
+    
+    def visible(self, snapshot, window):
+        if window is None:
+            return snapshot['players'], snapshot['bullets']
+        view = snapshot['views'].get(window)
+        if view is None:
+            view = snapshot['views'][window] = self.interest.select(snapshot, window)
+        return view
+    
+    def client_window(self, client_id):
+        player = self.players.get(client_id)
+        if self.interest is None or player is None:
+            return None
+        return self.interest.window(player.x, player.y)
+    
+    def build_update(self, seq, baseline, cursor, base_window=None, window=None):
+        current = self.snapshots[seq]
+        players, bullets = self.visible(current, window)
+        if baseline:
+            base_players, base_bullets = self.visible(self.snapshots[baseline], base_window)
+        else:
+            base_players, base_bullets = {}, {}
+        return build_delta(seq, baseline, players, bullets, base_players, base_bullets,
+                           self.journal.since(cursor, current['event_id']))
+    
+    def build_minimap(self, seq):
+        message = {
+            'type': 'minimap',
+            'sector_size': self.interest.sector_size,
+            'columns': self.interest.columns,
+            'rows': self.interest.rows,
+            'counts': self.interest.summary(self.snapshots[seq]['sectors'])
+        }
+        return encode_message(message, self.debug)
+    
+    def prepare_broadcast(self):
+        seq = self.take_snapshot()
+        # Client nào có baseline quá cũ (hoặc chưa ack) sẽ nhận keyframe đầy đủ
+        updates = {}
+        bodies = {}
+        outgoing = []
+        windows = self.snapshots[seq]['windows']
+        minimap = self.build_minimap(seq) if self.minimap and seq % self.minimap_interval == 0 else None
+        minimap_frame = frame(minimap) if minimap is not None else None
+        for client_id, writer in self.clients.items():
+            baseline = self.client_acks.get(client_id, 0)
+            if baseline not in self.snapshots:
+                baseline = 0
+            window = windows[client_id] = self.client_window(client_id)
+            base_window = self.snapshots[baseline]['windows'].get(client_id) if baseline else None
+            if window is not None and base_window is None:
+                baseline = 0
+            # Client có baseline hợp lệ luôn có cursor bằng event_id của baseline đó, và các client
+            # đứng gần nhau (và mọi người xem) chung window, nên số thân update khác nhau vẫn nhỏ.
+            # Mỗi thân chỉ mã hóa một lần; client chỉ có phần đầu riêng (input_ack) vài byte.
+            key = (baseline, self.event_cursors.get(client_id, 0), base_window, window)
+            if key not in updates:
+                updates[key] = self.build_update(seq, *key)
+                if not self.debug:
+                    bodies[key] = encode_update_body(updates[key])
+            input_ack = self.input_acks.get(client_id, 0)
+            if self.debug:
+                parts = [encode_message(dict(updates[key], input_ack=input_ack), True)]
+            else:
+                parts = update_parts(updates[key], bodies[key], input_ack)
+            udp_writer = self.udp_writers.get(client_id)
+            if (udp_writer is not None and udp_writer.address is not None and
+                    sum(map(len, parts)) <= MAX_DATAGRAM_SIZE):
+                outgoing.append((udp_writer, parts))
+                if minimap is not None:
+                    outgoing.append((udp_writer, [minimap]))
+            else:
+                buffers = frame_parts(parts)
+                if minimap_frame is not None:
+                    # Minimap đi liền sau update trong cùng một lần gửi để writer không bỏ nó thay cho update
+                    buffers.append(minimap_frame)
+                outgoing.append((writer, buffers))
+        return outgoing
     
     def broadcast_game_state(self):
         with self.lock:
-            game_state = {
-                'type': 'update',
-                'players': self.players,
-                'bullets': self.bullets,
-                'status': self.status_messages
-            }
-            state_json = json.dumps(game_state)
-            for client_socket in self.clients.values():
-                try:
-                    client_socket.send(state_json.encode())
-                except Exception as e:
-                    print(f"Error sending to client: {e}")
+            outgoing = self.prepare_broadcast()
+        for writer, buffers in outgoing:
+            writer.push(buffers)
+    
+    def run_tick(self, broadcast=True):
+        started = time.perf_counter()
+        self.update_game_state()
+        updated = time.perf_counter()
+        if not broadcast:
+            self.stats.record_tick(updated - started)
+            return
+        self.broadcast_game_state()
+        self.stats.record_tick(updated - started, time.perf_counter() - updated)
     
     def game_loop(self):
+        scheduler = TickScheduler(self.tick_rate, self.stats)
         while True:
-            self.update_game_state()
-            self.broadcast_game_state()
-            time.sleep(0.25)
+            steps, broadcast = scheduler.poll(time.perf_counter())
+            for step in range(steps):
+                self.run_tick(broadcast and step == steps - 1)
+            time.sleep(scheduler.delay(time.perf_counter()))
+
+    def stats_report(self):
+        with self.lock:
+            return self.stats.report(len(self.players), len(self.bullet_store))
+    
+    def start_stats(self):
+        if self.stats_port is not None:
+            threading.Thread(target=serve_stats, args=(self.stats_report, self.host, self.stats_port),
+                             daemon=True).start()
+        if self.stats_file is not None:
+            threading.Thread(target=dump_stats, args=(self.stats_report, self.stats_file), daemon=True).start()
 
     def start(self):
+        self.open_listener()
+        self.start_stats()
         threading.Thread(target=self.game_loop, daemon=True).start()
+        if self.udp:
+            threading.Thread(target=self.udp_loop, daemon=True).start()
         client_id = 0
-        while True:
-            client_socket, addr = self.server_socket.accept()
-            print(f"Client connected from {addr}")
-            client_id += 1
-            threading.Thread(target=self.handle_client, args=(client_socket, client_id), daemon=True).start()
+        try:
+            while True:
+                client_socket, addr = self.server_socket.accept()
+                print(f"Client connected from {addr}")
+                client_id += 1
+                threading.Thread(target=self.handle_client, args=(client_socket, client_id), daemon=True).start()
+        finally:
+            self.close_recorder()
 
 if __name__ == "__main__":
-    server = GameServer()
+    parser = argparse.ArgumentParser(description="Zace Game Server")
+    parser.add_argument('--json', action='store_true',
+                        help='Send JSON frames instead of the binary encoding (debugging)')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Serve every connection from a single asyncio event loop')
+    parser.add_argument('--numpy-bullets', action='store_true',
+                        help='Simulate bullets with NumPy arrays (requires numpy)')
+    parser.add_argument('--stats-port', type=int, default=None,
+                        help='Serve a JSON stats report to every connection on this port')
+    parser.add_argument('--stats-file', default=None,
+                        help='Rewrite this file with a JSON stats report every few seconds')
+    parser.add_argument('--maze-width', type=int, default=32, help='Maze width in cells (rounded up to odd)')
+    parser.add_argument('--maze-height', type=int, default=16, help='Maze height in cells (rounded up to odd)')
+    parser.add_argument('--maze-seed', type=int, default=None, help='Seed for a reproducible maze')
+    parser.add_argument('--no-aoi', dest='aoi', action='store_false',
+                        help='Send every player and bullet to every client instead of only nearby ones')
+    parser.add_argument('--minimap', action='store_true',
+                        help='Periodically send every client a per-sector player count summary')
+    parser.add_argument('--udp', action='store_true',
+                        help='Also accept UDP on the same port: updates become unreliable datagrams, '
+                             'inputs are sent redundantly (join and init stay on TCP)')
+    parser.add_argument('--bots', type=int, default=0,
+                        help='Fill the match with server-run AI players until it has this many players')
+    parser.add_argument('--tick-rate', type=tick_rate_arg, default=TICK_RATE,
+                        help='Simulation ticks per second; under load the broadcast rate drops first')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Seed for spawn positions and directions (random if omitted)')
+    parser.add_argument('--record', default=None, metavar='PATH',
+                        help='Record the seeds and every applied input to PATH (gzip if it ends in .gz) for replay.py')
+    args = parser.parse_args()
+    
+    options = {'debug': args.json, 'numpy_bullets': args.numpy_bullets, 'stats_port': args.stats_port,
+               'stats_file': args.stats_file, 'maze_width': args.maze_width, 'maze_height': args.maze_height,
+               'maze_seed': args.maze_seed, 'aoi': args.aoi, 'minimap': args.minimap, 'seed': args.seed,
+               'record': args.record, 'udp': args.udp, 'bots': args.bots, 'tick_rate': args.tick_rate}
+    if args.use_async:
+        from async_server import AsyncGameServer
+        server = AsyncGameServer(**options)
+    else:
+        server = GameServer(**options)
     server.start()
\ No newline at end of file
@@ -0,0 +1,134 @@
+import argparse
+import json
+import multiprocessing
+import random
+import time
+
+from bot import bot_action
+from engine import TICK_RATE, GameEngine
+from protocol import DIRECTION_CODES
+from scheduler import tick_rate_arg
+
+def run_match(job):
+    # Một trận bot đấu bot trên GameEngine, không mạng, không sleep; kết quả chỉ phụ thuộc seed
+    rng = random.Random(job['seed'])
+    engine = GameEngine(job['maze_width'], job['maze_height'], maze_seed=job['seed'], seed=rng.getrandbits(63),
+                        numpy_bullets=job['numpy_bullets'])
+    bots = []
+    for i in range(job['players']):
+        pattern = job['patterns'][i % len(job['patterns'])]
+        engine.spawn_player(i + 1, f"{pattern}{i + 1}")
+        bots.append([i + 1, pattern, random.Random(rng.getrandbits(63)), 0])
+
+    # Số input trung bình mỗi bot gửi trong một tick, như bot.py gửi với --rate
+    per_tick = job['rate'] / job['tick_rate']
+    started = time.process_time()
+    for _ in range(job['ticks']):
+        for bot in bots:
+            player_id, pattern, bot_rng = bot[0], bot[1], bot[2]
+            count = int(per_tick) + (bot_rng.random() < per_tick % 1)
+            for _ in range(count):
+                action = bot_action(pattern, job['script'], bot_rng, bot[3])
+                bot[3] += 1
+                if action['type'] == 'shoot':
+                    engine.shoot(player_id)
+                else:
+                    engine.move(player_id, DIRECTION_CODES[action['direction']])
+        engine.step()
+
+    return {
+        'seed': job['seed'],
+        'ticks': engine.ticks,
+        'cpu': time.process_time() - started,
+        'shots': engine.shots,
+        'kills': engine.kills,
+        'scores': [(bot[1], engine.players[bot[0]].score) for bot in bots]
+    }
+
+def summarize(results, elapsed, workers):
+    matches = len(results)
+    ticks = sum(r['ticks'] for r in results)
+    cpu = sum(r['cpu'] for r in results)
+    shots = sum(r['shots'] for r in results)
+    kills = sum(r['kills'] for r in results)
+    patterns = {}
+    for result in results:
+        best = max(score for _, score in result['scores'])
+        winners = {pattern for pattern, score in result['scores'] if score == best}
+        for pattern, score in result['scores']:
+            entry = patterns.setdefault(pattern, {'bots': 0, 'score_total': 0, 'wins': 0})
+            entry['bots'] += 1
+            entry['score_total'] += score
+        for pattern in winners:
+            patterns[pattern]['wins'] += 1
+    return {
+        'matches': matches,
+        'workers': workers,
+        'wall_s': elapsed,
+        'ticks': ticks,
+        'ticks_per_s': ticks / elapsed if elapsed else 0.0,
+        'ticks_per_cpu_s': ticks / cpu if cpu else 0.0,
+        'matches_per_s': matches / elapsed if elapsed else 0.0,
+        'shots_per_match': shots / matches if matches else 0.0,
+        'kills_per_match': kills / matches if matches else 0.0,
+        'hit_rate': kills / shots if shots else 0.0,
+        'patterns': {pattern: {'mean_score': entry['score_total'] / entry['bots'],
+                               'win_rate': entry['wins'] / matches}
+                     for pattern, entry in patterns.items()}
+    }
+
+def print_summary(summary):
+    print(f"Simulated {summary['matches']} matches ({summary['ticks']} ticks) in {summary['wall_s']:.2f} s "
+          f"on {summary['workers']} worker(s)")
+    print(f"Throughput: {summary['ticks_per_s']:.0f} ticks/s, {summary['ticks_per_cpu_s']:.0f} ticks/s per core, "
+          f"{summary['matches_per_s']:.1f} matches/s")
+    print(f"Per match: {summary['shots_per_match']:.1f} shots, {summary['kills_per_match']:.1f} kills "
+          f"(hit rate {summary['hit_rate'] * 100:.1f}%)")
+    for pattern, entry in sorted(summary['patterns'].items()):
+        print(f"  {pattern:<8} mean score {entry['mean_score']:8.1f}  wins {entry['win_rate'] * 100:5.1f}%")
+
+def run_batch(matches=1000, workers=None, players=8, ticks=2400, maze_width=32, maze_height=16,
+              patterns=('random',), script='', rate=4.0, numpy_bullets=False, seed=0, tick_rate=TICK_RATE):
+    workers = workers or multiprocessing.cpu_count()
+    jobs = [{'seed': seed + i, 'players': players, 'ticks': ticks, 'maze_width': maze_width,
+             'maze_height': maze_height, 'patterns': list(patterns), 'script': script or 'uurrddlls',
+             'rate': rate, 'tick_rate': tick_rate, 'numpy_bullets': numpy_bullets}
+            for i in range(matches)]
+    started = time.perf_counter()
+    if workers == 1:
+        results = [run_match(job) for job in jobs]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            results = list(pool.imap_unordered(run_match, jobs, chunksize=max(1, matches // (workers * 8))))
+    results.sort(key=lambda r: r['seed'])
+    return summarize(results, time.perf_counter() - started, workers)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play many headless bot matches in parallel and report stats")
+    parser.add_argument('--matches', type=int, default=1000, help='Number of matches to play')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--players', type=int, default=8, help='Bots per match')
+    parser.add_argument('--ticks', type=int, default=2400, help='Ticks per match (--tick-rate ticks = 1 s of play)')
+    parser.add_argument('--maze-width', type=int, default=32, help='Maze width in cells (rounded up to odd)')
+    parser.add_argument('--maze-height', type=int, default=16, help='Maze height in cells (rounded up to odd)')
+    parser.add_argument('--patterns', default='random',
+                        help="Comma-separated bot patterns assigned in turn, e.g. 'random,script'")
+    parser.add_argument('--script', default='',
+                        help="Actions for the 'script' pattern: u/d/l/r to move, s to shoot")
+    parser.add_argument('--rate', type=float, default=4.0, help='Inputs per second per bot')
+    parser.add_argument('--tick-rate', type=tick_rate_arg, default=TICK_RATE,
+                        help='Ticks per second of play, used to turn --rate into inputs per tick')
+    parser.add_argument('--numpy-bullets', action='store_true', help='Use the NumPy bullet store')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the first match; match i uses seed + i')
+    parser.add_argument('--json', dest='json_path', default=None, help='Also write the summary to this JSON file')
+    args = parser.parse_args()
+    if not set(args.patterns.split(',')) <= {'random', 'script'}:
+        parser.error("--patterns only accepts 'random' and 'script'")
+
+    summary = run_batch(args.matches, args.workers, args.players, args.ticks, args.maze_width, args.maze_height,
+                        args.patterns.split(','), args.script, args.rate, args.numpy_bullets, args.seed,
+                        args.tick_rate)
+    print_summary(summary)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(summary, f, indent=2)
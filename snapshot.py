@@ -0,0 +1,200 @@
+from collections import deque
+
+from protocol import DIRECTION_DELTAS
+
+# Số snapshot giữ làm baseline trước khi nhận init; sau đó theo số 'history' trong init (bằng số
+# snapshot server giữ), để không bỏ một baseline mà server vẫn có thể dùng cho delta
+SNAPSHOT_HISTORY = 64
+# Số sự kiện gần nhất client giữ lại để hiển thị
+EVENT_LOG_SIZE = 32
+
+def build_delta(seq, baseline, players, bullets, base_players, base_bullets, events):
+    # Update cho client có baseline (đã ack) là base_*: chỉ người chơi/đạn đổi so với baseline và id
+    # những gì đã biến mất. players/bullets là dict theo id; SnapshotHistory.apply làm ngược lại.
+    return {
+        'type': 'update',
+        'seq': seq,
+        'baseline': baseline,
+        'players': {player_id: player for player_id, player in players.items()
+                    if base_players.get(player_id) != player},
+        'removed_players': [player_id for player_id in base_players if player_id not in players],
+        'bullets': [bullet for bullet_id, bullet in bullets.items() if base_bullets.get(bullet_id) != bullet],
+        'removed_bullets': [bullet_id for bullet_id in base_bullets if bullet_id not in bullets],
+        'events': events
+    }
+
+class SnapshotHistory:
+    def __init__(self, size=SNAPSHOT_HISTORY):
+        self.size = size
+        self.snapshots = {}
+        self.last_seq = 0
+        self.events = deque(maxlen=EVENT_LOG_SIZE)
+        self.last_event_id = 0
+
+    def reset(self, size=None):
+        if size is not None:
+            self.size = size
+        self.snapshots = {}
+        self.last_seq = 0
+        self.events.clear()
+        self.last_event_id = 0
+
+    def apply(self, message):
+        # Trả về (players, bullets, events) sau khi áp delta, hoặc None nếu update cũ/thiếu baseline.
+        # Sự kiện được gửi lại cho tới khi ack nên bỏ qua những id đã thấy.
+        seq = message['seq']
+        baseline = message['baseline']
+        if seq <= self.last_seq:
+            return None
+        if baseline:
+            base = self.snapshots.get(baseline)
+            if base is None:
+                return None
+            players, bullets = dict(base[0]), dict(base[1])
+        else:
+            players, bullets = {}, {}
+
+        for player_id in message['removed_players']:
+            players.pop(player_id, None)
+        for player_id, player in message['players'].items():
+            players[int(player_id)] = player
+        for bullet_id in message['removed_bullets']:
+            bullets.pop(bullet_id, None)
+        for bullet in message['bullets']:
+            bullets[bullet['id']] = bullet
+
+        for event in message['events']:
+            if event['id'] > self.last_event_id:
+                self.events.append(event)
+                self.last_event_id = event['id']
+
+        self.snapshots[seq] = (players, bullets)
+        for old_seq in [s for s in self.snapshots if s <= seq - self.size]:
+            del self.snapshots[old_seq]
+        self.last_seq = seq
+        return players, bullets, list(self.events)
+
+# Trễ hiển thị = khoảng cách trung bình giữa hai snapshot * hệ số này
+INTERPOLATION_MARGIN = 1.2
+# Nhảy xa hơn số ô này giữa hai snapshot (hồi sinh) thì không nội suy
+MAX_INTERPOLATION_STEP = 2
+
+class SnapshotBuffer:
+    # Bất biến: push trả về buffer mới, nên luồng vẽ lấy mẫu trên buffer nó đang giữ mà không cần khóa
+    def __init__(self, entries=(), interval=None, size=8):
+        self.entries = entries
+        self.interval = interval
+        self.size = size
+
+    def push(self, received_at, players, bullets):
+        interval = self.interval
+        if self.entries:
+            gap = received_at - self.entries[-1][0]
+            interval = gap if interval is None else interval * 0.9 + gap * 0.1
+        entries = (self.entries + ((received_at, players, bullets),))[-self.size:]
+        return SnapshotBuffer(entries, interval, self.size)
+
+    def delay(self):
+        return (self.interval or 0.0) * INTERPOLATION_MARGIN
+
+    def sample(self, now):
+        # Trả về (players, bullets) ở thời điểm now - delay, nội suy giữa hai snapshot gần nhất
+        if not self.entries:
+            return {}, []
+        render_time = now - self.delay()
+        newest = self.entries[-1]
+        if render_time >= newest[0] or len(self.entries) == 1:
+            return self.blend(newest, newest, 1.0)
+        if render_time <= self.entries[0][0]:
+            return self.blend(self.entries[0], self.entries[0], 1.0)
+        for older, newer in zip(self.entries, self.entries[1:]):
+            if older[0] <= render_time <= newer[0]:
+                span = newer[0] - older[0]
+                alpha = (render_time - older[0]) / span if span > 0 else 1.0
+                return self.blend(older, newer, alpha)
+        return self.blend(newest, newest, 1.0)
+
+    def blend(self, older, newer, alpha):
+        players = {player_id: self.lerp(older[1].get(player_id), player, alpha)
+                   for player_id, player in newer[1].items()}
+        bullets = [self.lerp(older[2].get(bullet_id), bullet, alpha)
+                   for bullet_id, bullet in newer[2].items()]
+        return players, bullets
+
+    def lerp(self, before, after, alpha):
+        entity = dict(after)
+        if before is None or alpha >= 1.0:
+            return entity
+        dx = after['x'] - before['x']
+        dy = after['y'] - before['y']
+        if abs(dx) + abs(dy) <= MAX_INTERPOLATION_STEP:
+            entity['x'] = before['x'] + dx * alpha
+            entity['y'] = before['y'] + dy * alpha
+        return entity
+
+class ClientState:
+    # Trạng thái client mà luồng mạng công bố cho luồng vẽ bằng một phép gán tham chiếu (nguyên tử
+    # trong CPython). Luồng vẽ đọc tham chiếu một lần mỗi frame; không ai sửa một ClientState hay các
+    # dict bên trong nó sau khi đã công bố, mỗi thay đổi tạo một bản mới qua replace().
+    __slots__ = ('generation', 'player_id', 'maze', 'players', 'events', 'input_ack', 'version', 'buffer',
+                 'minimap')
+
+    def __init__(self, generation=0, player_id=None, maze=(), players=None, events=(), input_ack=0, version=0,
+                 buffer=None, minimap=None):
+        # generation tăng mỗi lần nhận init (mê cung mới), version mỗi khi players/events đổi
+        self.generation = generation
+        self.player_id = player_id
+        self.maze = maze
+        self.players = {} if players is None else players
+        self.events = events
+        self.input_ack = input_ack
+        self.version = version
+        self.buffer = SnapshotBuffer() if buffer is None else buffer
+        self.minimap = minimap
+
+    def replace(self, **changes):
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return ClientState(**fields)
+
+class MovePredictor:
+    def __init__(self, size=64):
+        self.pending = deque(maxlen=size)
+        self.last_ack = 0
+        self.state = None
+
+    def reset(self):
+        self.pending.clear()
+        self.last_ack = 0
+        self.state = None
+
+    def record(self, seq, direction, maze, players, own_id):
+        if seq <= self.last_ack:
+            return
+        self.pending.append((seq, direction))
+        if self.state is not None:
+            self.step(self.state, direction, maze, players, own_id)
+
+    def reconcile(self, input_ack, maze, players, own_id):
+        # Bắt đầu lại từ vị trí server xác nhận rồi áp lại các input server chưa xử lý
+        self.last_ack = max(self.last_ack, input_ack)
+        while self.pending and self.pending[0][0] <= self.last_ack:
+            self.pending.popleft()
+        me = players.get(own_id)
+        if me is None:
+            self.state = None
+            return
+        state = {'x': me['x'], 'y': me['y'], 'direction': me['direction']}
+        for _, direction in self.pending:
+            self.step(state, direction, maze, players, own_id)
+        self.state = state
+
+    def step(self, state, direction, maze, players, own_id):
+        state['direction'] = direction
+        dx, dy = DIRECTION_DELTAS[direction]
+        new_x, new_y = state['x'] + dx, state['y'] + dy
+        if (0 <= new_y < len(maze) and 0 <= new_x < len(maze[0]) and maze[new_y][new_x] == 0 and
+                not any(player_id != own_id and p['x'] == new_x and p['y'] == new_y
+                        for player_id, p in players.items())):
+            state['x'] = new_x
+            state['y'] = new_y
@@ -0,0 +1,167 @@
+import bisect
+import json
+import os
+import socket
+import threading
+import time
+
+# Biên trên (ms) của các ô histogram; ô cuối nhận mọi giá trị lớn hơn
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250)
+STATS_DUMP_INTERVAL = 5.0
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        ms = seconds * 1000
+        self.buckets[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def to_dict(self):
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count, 4) if self.count else 0.0,
+            'max_ms': round(self.max, 4),
+            'buckets': dict(zip(labels, self.buckets))
+        }
+
+class TimedLock:
+    # Thay cho threading.Lock: ghi lại thời gian chờ và thời gian giữ khóa.
+    # Hai histogram chỉ được ghi khi đang giữ khóa nên không cần đồng bộ thêm.
+    def __init__(self, stats):
+        self._lock = threading.Lock()
+        self.wait = stats.lock_wait
+        self.hold = stats.lock_hold
+        self.acquired_at = 0.0
+
+    def __enter__(self):
+        started = time.perf_counter()
+        self._lock.acquire()
+        self.acquired_at = time.perf_counter()
+        self.wait.record(self.acquired_at - started)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.hold.record(time.perf_counter() - self.acquired_at)
+        self._lock.release()
+
+# Vị trí các bộ đếm trong danh sách của mỗi client
+MSGS_IN, BYTES_IN, MSGS_OUT, BYTES_OUT, FRAMES_DROPPED = range(5)
+
+class ServerStats:
+    def __init__(self, tick_rate=None):
+        self.started = time.time()
+        self.tick_rate = tick_rate
+        self.ticks = 0
+        # Bộ lập lịch tick: số lần bị trễ, số tick chạy bù, số tick bỏ hẳn, broadcast mỗi bao nhiêu tick
+        self.overruns = 0
+        self.catch_up_ticks = 0
+        self.skipped_ticks = 0
+        self.broadcast_divisor = 1
+        self.tick_update = Histogram()
+        self.tick_broadcast = Histogram()
+        self.tick_total = Histogram()
+        self.lock_wait = Histogram()
+        self.lock_hold = Histogram()
+        self.clients = {}
+        # Cộng dồn bộ đếm của các client đã rời đi
+        self.departed = [0] * 5
+
+    def add_client(self, client_id):
+        self.clients[client_id] = [0] * 5
+
+    def remove_client(self, client_id):
+        counters = self.clients.pop(client_id, None)
+        if counters is not None:
+            self.departed = [a + b for a, b in zip(self.departed, counters)]
+
+    # Mỗi bộ đếm chỉ được tăng từ một thread (thread đọc của client hoặc game loop)
+    def count_in(self, client_id, size):
+        counters = self.clients.get(client_id)
+        if counters is not None:
+            counters[MSGS_IN] += 1
+            counters[BYTES_IN] += size
+
+    def count_out(self, client_id, size):
+        counters = self.clients.get(client_id)
+        if counters is not None:
+            counters[MSGS_OUT] += 1
+            counters[BYTES_OUT] += size
+
+    def count_dropped(self, client_id):
+        counters = self.clients.get(client_id)
+        if counters is not None:
+            counters[FRAMES_DROPPED] += 1
+
+    def record_tick(self, update_time, broadcast_time=None):
+        # broadcast_time là None với tick chỉ mô phỏng (chạy bù hoặc broadcast bị giãn khi quá tải)
+        self.ticks += 1
+        self.tick_update.record(update_time)
+        if broadcast_time is None:
+            self.tick_total.record(update_time)
+        else:
+            self.tick_broadcast.record(broadcast_time)
+            self.tick_total.record(update_time + broadcast_time)
+
+    def report(self, players, bullets):
+        names = ('msgs_in', 'bytes_in', 'msgs_out', 'bytes_out', 'frames_dropped')
+        totals = list(self.departed)
+        clients = {}
+        for client_id, counters in list(self.clients.items()):
+            clients[client_id] = dict(zip(names, counters))
+            totals = [a + b for a, b in zip(totals, counters)]
+        return {
+            'time': time.time(),
+            'uptime': time.time() - self.started,
+            'ticks': self.ticks,
+            'tick_rate': self.tick_rate,
+            'broadcast_rate': self.tick_rate / self.broadcast_divisor if self.tick_rate else None,
+            'overruns': self.overruns,
+            'catch_up_ticks': self.catch_up_ticks,
+            'skipped_ticks': self.skipped_ticks,
+            'players': players,
+            'bullets': bullets,
+            'connected_clients': len(clients),
+            'tick_update': self.tick_update.to_dict(),
+            'tick_broadcast': self.tick_broadcast.to_dict(),
+            'tick_total': self.tick_total.to_dict(),
+            'lock_wait': self.lock_wait.to_dict(),
+            'lock_hold': self.lock_hold.to_dict(),
+            'traffic': dict(zip(names, totals)),
+            'clients': clients
+        }
+
+def serve_stats(report, host, port):
+    # Mỗi kết nối nhận một bản JSON rồi bị đóng: `nc 127.0.0.1 <port>`
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(5)
+    print(f"Stats available on {host}:{port}")
+    while True:
+        connection, _ = listener.accept()
+        try:
+            connection.sendall(json.dumps(report(), indent=2).encode('utf-8') + b'\n')
+        except Exception as e:
+            print(f"Error sending stats: {e}")
+        finally:
+            connection.close()
+
+def dump_stats(report, path, interval=STATS_DUMP_INTERVAL):
+    while True:
+        time.sleep(interval)
+        try:
+            temp_path = path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(report(), f, indent=2)
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"Error writing stats: {e}")